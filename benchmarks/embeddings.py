@@ -0,0 +1,145 @@
+"""Per-query CPU, latency and batch throughput of the embedding backends on CPU.
+
+Compares ChromaDB's stock embedding function with the tuned ONNX and
+sentence-transformers backends (fp32 and int8), and reports how closely each one's
+vectors agree with the stock model (mean cosine similarity).
+
+    uv run python -m benchmarks.embeddings --threads 1 --queries 500
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.embedding_backends import embedding_backend
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIGS = {
+    "chroma default": dict(backend="chroma"),
+    "onnx fp32": dict(backend="onnx"),
+    "onnx int8": dict(backend="onnx", quantize=True),
+    "sentence-transformers fp32": dict(backend="sentence-transformers"),
+    "sentence-transformers int8": dict(backend="sentence-transformers", quantize=True),
+}
+
+WORDS = (
+    "strap color heel height sleeve length screen resolution battery capacity "
+    "material neckline water resistance skin type heart notes closure pattern "
+    "fit occasion season weight width depth voltage"
+).split()
+
+
+def attribute_names(count: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(rng.choice(WORDS, size=rng.integers(1, 4)).tolist()).title()
+        for _ in range(count)
+    ]
+
+
+def measure(
+    config: Dict[str, Any],
+    threads: int,
+    queries: List[str],
+    documents: List[str],
+    batch_size: int,
+) -> Dict[str, Any]:
+    embedding = embedding_backend(threads=threads, **config)
+
+    started = time.perf_counter()
+    embedding(["warmup"])
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    cpu_started = time.process_time()
+    for query in queries:
+        started = time.perf_counter()
+        embedding([query])
+        latencies.append(time.perf_counter() - started)
+    cpu_per_query = (time.process_time() - cpu_started) / len(queries)
+
+    started = time.perf_counter()
+    vectors = []
+    for start in range(0, len(documents), batch_size):
+        vectors.extend(embedding(documents[start : start + batch_size]))
+    batch_seconds = time.perf_counter() - started
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "query_latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+        },
+        "cpu_ms_per_query": round(cpu_per_query * 1000, 3),
+        "batch_docs_per_second": round(len(documents) / batch_seconds, 1),
+        "vectors": np.asarray(vectors, dtype=np.float32),
+    }
+
+
+def agreement(vectors: np.ndarray, reference: Optional[np.ndarray]) -> Optional[float]:
+    if reference is None or vectors.shape != reference.shape:
+        return None
+    return round(float(np.mean(np.sum(vectors * reference, axis=1))), 5)
+
+
+def main(args: argparse.Namespace):
+    queries = attribute_names(args.queries, seed=1)
+    documents = attribute_names(args.documents, seed=2)
+
+    results = {}
+    reference = None
+    print(
+        f"{'backend':28} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'cpu ms/q':>9} {'docs/s':>9} {'cosine':>8}"
+    )
+    for name, config in CONFIGS.items():
+        try:
+            result = measure(config, args.threads, queries, documents, args.batch_size)
+        except Exception as e:  # missing package or model download
+            results[name] = {"unavailable": str(e)}
+            print(f"{name:28} unavailable: {e}")
+            continue
+
+        vectors = result.pop("vectors")
+        if reference is None and config["backend"] == "chroma":
+            reference = vectors
+        result["cosine_vs_chroma_default"] = agreement(vectors, reference)
+        results[name] = result
+        print(
+            f"{name:28} {result['load_seconds']:7.2f} "
+            f"{result['query_latency_ms']['p50']:8.2f} "
+            f"{result['query_latency_ms']['p95']:8.2f} "
+            f"{result['cpu_ms_per_query']:9.2f} "
+            f"{result['batch_docs_per_second']:9.0f} "
+            f"{result['cosine_vs_chroma_default'] or float('nan'):8.4f}"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {"config": vars(args), "cpu_count": os.cpu_count(), "results": results},
+                f,
+                indent=4,
+            )
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--threads", type=int, default=1, help="intra-op threads (0 = runtime default)"
+    )
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument(
+        "--output", default=os.path.join(BASE_DIR, "results", "embeddings.json")
+    )
+    main(parser.parse_args())
@@ -0,0 +1,399 @@
+"""Benchmark harness for the /generate-prompt hot path.
+
+Replays request payloads (one `PromptGenerationRequest` JSON object per line) against
+the ASGI app in-process. The vector store is seeded from the payloads plus synthetic
+filler attributes, and Azure OpenAI is replaced by a local stand-in with configurable
+latency and failure rates. Each path is measured separately:
+
+- exact_match: payload names that are in the index, so the LLM is bypassed
+- llm: unseen names, so every request embeds, searches and calls the LLM
+- has_failed: known names with `has_failed`, so the stored prompt goes to the LLM
+
+Results are written as JSON so runs can be diffed between commits:
+
+    uv run python -m benchmarks.hot_path --requests 500 --concurrency 32 \\
+        --output benchmarks/results/hot_path.json --compare previous.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com/")
+
+import httpx
+import numpy as np
+
+from src import api
+from src.embeddings import CachedEmbeddingFunction
+from src.generator import PromptGenerator
+from src.logger import configure_logging
+from src.singleflight import SingleFlight
+from src.vector_store import VectorStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ("exact_match", "llm", "has_failed")
+COMPARED_METRICS = (
+    "throughput_rps",
+    "latency_ms.p50",
+    "latency_ms.p95",
+    "latency_ms.p99",
+    "cpu_ms_per_request",
+)
+
+
+class FakeAzureOpenAI:
+    """httpx transport handler standing in for the Azure OpenAI chat completions API.
+
+    Latency is log-normal around `latency_median` seconds; `throttle_rate` of the
+    calls answer 429 with a Retry-After and `error_rate` answer 500.
+    """
+
+    def __init__(
+        self,
+        latency_median: float,
+        latency_sigma: float,
+        throttle_rate: float,
+        error_rate: float,
+        seed: int = 0,
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.latency_median > 0:
+            await asyncio.sleep(
+                self.random.lognormvariate(
+                    math.log(self.latency_median), self.latency_sigma
+                )
+            )
+
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.calls[429] += 1
+            return httpx.Response(
+                429,
+                headers={"retry-after-ms": "50"},
+                json={"error": {"code": "429", "message": "Rate limit exceeded."}},
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            self.calls[500] += 1
+            return httpx.Response(
+                500, json={"error": {"code": "500", "message": "Fake failure."}}
+            )
+
+        self.calls[200] += 1
+        messages = json.loads(request.content)["messages"]
+        content = {
+            "prompt": "Extract the requested attribute. "
+            + messages[-1]["content"][:1200],
+            "system_role": "You are a product attribute extraction expert.",
+        }
+        return httpx.Response(
+            200,
+            json={
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps(content),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 400,
+                    "completion_tokens": 300,
+                    "total_tokens": 700,
+                },
+            },
+        )
+
+
+class HashingEmbedding:
+    """Offline stand-in for the embedding model: hashed character trigrams."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for text in input:
+            v = np.zeros(self.dim, dtype=np.float32)
+            padded = f"  {text.lower()} "
+            for i in range(len(padded) - 2):
+                digest = hashlib.blake2b(padded[i : i + 3].encode(), digest_size=4)
+                v[int.from_bytes(digest.digest(), "little") % self.dim] += 1.0
+            vectors.append(v / (np.linalg.norm(v) or 1.0))
+        return vectors
+
+
+def load_payloads(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_store(
+    payloads: List[Dict[str, Any]], directory: str, index_size: int, embedding: str
+) -> VectorStore:
+    store = VectorStore(
+        persist_directory=directory,
+        embedding_function=CachedEmbeddingFunction(
+            HashingEmbedding() if embedding == "hashing" else None
+        ),
+    )
+    names = list(dict.fromkeys(p["attribute_name"] for p in payloads))
+    names += [
+        f"Filler Attribute {i:05d}" for i in range(max(0, index_size - len(names)))
+    ]
+    store.add_texts(
+        ids=[f"attr_{i}" for i in range(len(names))],
+        texts=names,
+        metadatas=[
+            {
+                "prompt": f"What is the {name} of the product? " * 20,
+                "system_role": "You are a product attribute extraction expert.",
+            }
+            for name in names
+        ],
+    )
+    return store
+
+
+def scenario_payloads(
+    scenario: str, payloads: List[Dict[str, Any]], count: int, offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Request bodies for a scenario; LLM-bound requests are made unique so they
+    are neither coalesced nor served from a cache."""
+    requests = []
+    for i in range(offset, offset + count):
+        payload = dict(payloads[i % len(payloads)])
+        if scenario == "exact_match":
+            payload["has_failed"] = False
+        elif scenario == "llm":
+            payload["attribute_name"] = f"{payload['attribute_name']} variant {i}"
+            payload["has_failed"] = False
+        else:
+            payload["description"] = f"{payload.get('description') or ''} (run {i})"
+            payload["has_failed"] = True
+        requests.append(payload)
+    return requests
+
+
+def percentile_summary(latencies: List[float]) -> Dict[str, float]:
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+async def replay(
+    client: httpx.AsyncClient, payloads: List[Dict[str, Any]], concurrency: int
+) -> Dict[str, Any]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async def send(payload):
+        async with slots:
+            started = time.perf_counter()
+            response = await client.post("/generate-prompt", json=payload)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(send(payload) for payload in payloads))
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    return {
+        "requests": len(payloads),
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "status_codes": {str(status): n for status, n in sorted(statuses.items())},
+        "throughput_rps": round(len(payloads) / wall, 2),
+        "latency_ms": percentile_summary(latencies),
+        # Process CPU over the run: event loop, search threads and the fake server.
+        "cpu_ms_per_request": round(cpu / len(payloads) * 1000, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metric(result: Dict[str, Any], path: str) -> Optional[float]:
+    for key in path.split("."):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]):
+    print(f"\nCompared with {previous['meta'].get('git_commit')}:")
+    for scenario, result in current["scenarios"].items():
+        before = previous["scenarios"].get(scenario)
+        if before is None:
+            continue
+        for path in COMPARED_METRICS:
+            old, new = metric(before, path), metric(result, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            print(
+                f"  {scenario:12} {path:20} {old:12.3f} -> {new:12.3f} ({change:+.1f}%)"
+            )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    payloads = load_payloads(args.payloads)
+    fake_azure = FakeAzureOpenAI(
+        latency_median=args.llm_latency,
+        latency_sigma=args.llm_latency_sigma,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = build_store(payloads, directory, args.index_size, args.embedding)
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(fake_azure))
+        api.vector_store = store
+        api.generator = PromptGenerator(http_client=http_client)
+        api.inflight_requests = SingleFlight()
+
+        results = {}
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=api.app),
+            base_url="http://benchmark",
+            timeout=None,
+        ) as client:
+            for scenario in args.scenarios:
+                await replay(
+                    client,
+                    scenario_payloads(scenario, payloads, args.warmup, offset=10**6),
+                    args.concurrency,
+                )
+                results[scenario] = await replay(
+                    client,
+                    scenario_payloads(scenario, payloads, args.requests),
+                    args.concurrency,
+                )
+                print(
+                    f"{scenario:12} {results[scenario]['throughput_rps']:9.1f} req/s  "
+                    f"p50 {results[scenario]['latency_ms']['p50']:8.2f} ms  "
+                    f"p95 {results[scenario]['latency_ms']['p95']:8.2f} ms  "
+                    f"p99 {results[scenario]['latency_ms']['p99']:8.2f} ms  "
+                    f"cpu {results[scenario]['cpu_ms_per_request']:7.3f} ms/req  "
+                    f"errors {results[scenario]['errors']}"
+                )
+
+        await api.generator.aclose()
+        await http_client.aclose()
+        store.close()
+        api.vector_store = api.generator = None
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                key: value for key, value in vars(args).items() if key != "compare"
+            },
+            "fake_llm_calls": {str(k): v for k, v in sorted(fake_azure.calls.items())},
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", default=os.path.join(BASE_DIR, "payloads.jsonl"))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--index-size", type=int, default=2000)
+    parser.add_argument(
+        "--embedding",
+        choices=("default", "hashing"),
+        default="default",
+        help="'default' uses the production model; 'hashing' runs fully offline.",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.3)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=os.path.join(BASE_DIR, "results", "hot_path.json")
+    )
+    parser.add_argument("--compare", help="previous results file to diff against")
+    parser.add_argument(
+        "--logs",
+        action="store_true",
+        help="keep application logs on stdout instead of discarding them",
+    )
+    args = parser.parse_args()
+
+    if not args.logs:
+        # Logging still runs (and costs what it costs), it just goes nowhere.
+        configure_logging(
+            callsite=os.getenv("LOG_CALLSITE", "full").lower(),
+            renderer=os.getenv("LOG_RENDERER", "json").lower(),
+            use_queue=os.getenv("LOG_ASYNC", "false").lower() in ("1", "true", "yes"),
+            stream=open(os.devnull, "w"),
+        )
+
+    results = asyncio.run(run(args))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Per-call cost of a request log line under each logging configuration.
+
+Measures the time spent on the calling thread (what a request pays) and, for the
+queued modes, the time until the listener thread has written everything.
+
+    uv run python -m benchmarks.logging_overhead --iterations 20000
+"""
+
+import argparse
+import os
+import time
+
+import structlog
+
+from src import logger as logger_module
+from src.logger import configure_logging, sample_request_logs
+
+MODES = {
+    "baseline (full callsite, json, sync)": dict(callsite="full", renderer="json"),
+    "cached callsite": dict(callsite="cached", renderer="json"),
+    "cached callsite + orjson": dict(callsite="cached", renderer="orjson"),
+    "cached callsite + orjson + queue": dict(
+        callsite="cached", renderer="orjson", use_queue=True
+    ),
+    "no callsite + orjson + queue": dict(
+        callsite="off", renderer="orjson", use_queue=True
+    ),
+    "no callsite + orjson + queue, 10% sampled": dict(
+        callsite="off", renderer="orjson", use_queue=True, sample_rate=0.1
+    ),
+}
+
+
+def run(iterations: int, sample_rate: float = 1.0, **options):
+    os.environ["LOG_INFO_SAMPLE_RATE"] = str(sample_rate)
+    with open(os.devnull, "w") as sink:
+        configure_logging(stream=sink, **options)
+        log = structlog.get_logger("benchmark")
+
+        started = time.perf_counter()
+        for i in range(iterations):
+            sample_request_logs()  # one log line per simulated request
+            log.info(
+                "Received generation request for attribute: Strap Color",
+                attribute="Strap Color",
+                iteration=i,
+            )
+        caller = time.perf_counter() - started
+        logger_module.flush_logging()
+        drained = time.perf_counter() - started
+    return caller / iterations * 1e6, drained / iterations * 1e6
+
+
+def main(iterations: int):
+    print(f"{'mode':44} {'caller us/log':>14} {'written us/log':>15}")
+    for name, options in MODES.items():
+        caller_us, drained_us = run(iterations, **options)
+        print(f"{name:44} {caller_us:14.2f} {drained_us:15.2f}")
+    configure_logging()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args().iterations)
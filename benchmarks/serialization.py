@@ -0,0 +1,63 @@
+"""Per-request cost of the /generate-prompt response serialization paths.
+
+Compares FastAPI's default path (response_model validation + JSONResponse) with the
+pre-serialized path enabled by FAST_JSON_RESPONSES.
+
+    uv run python -m benchmarks.serialization --iterations 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from src.api import app
+from src.formatting import build_prompts, orjson, serialize_prompts
+
+PROMPT = (
+    "Identify the dominant strap color of the watch shown in the product images. "
+    "Ignore the dial, the case and any packaging; report a single basic color name. "
+) * 8
+SYSTEM_ROLE = "You are a meticulous e-commerce catalog attribute extraction expert."
+
+
+async def default_path(field) -> bytes:
+    prompts = build_prompts(PROMPT, SYSTEM_ROLE, "Strap Color", True)
+    content = await serialize_response(field=field, response_content=prompts)
+    return JSONResponse(content).body
+
+
+def fast_path() -> bytes:
+    return serialize_prompts(PROMPT, SYSTEM_ROLE, "Strap Color", True)
+
+
+async def main(iterations: int):
+    route = next(r for r in app.routes if getattr(r, "path", "") == "/generate-prompt")
+    field = route.response_field
+
+    assert await default_path(field) == fast_path()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await default_path(field)
+    default_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fast_path()
+    fast_us = (time.perf_counter() - started) / iterations * 1e6
+
+    print(
+        f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}"
+    )
+    print(f"default response_model path: {default_us:8.2f} us/request")
+    print(f"pre-serialized path:         {fast_us:8.2f} us/request")
+    print(f"saved:                       {default_us - fast_us:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args().iterations))
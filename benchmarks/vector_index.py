@@ -0,0 +1,107 @@
+"""Query latency of the ChromaDB and NumPy vector store backends.
+
+Indexes random normalized 384-d vectors (the all-MiniLM-L6-v2 dimension) into both
+backends and times top-k queries against each, one query per call as the
+/generate-prompt path issues them.
+
+    uv run python -m benchmarks.vector_index --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+import chromadb
+import numpy as np
+
+from src.numpy_index import NumpyCollection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def random_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(collection: Any, vectors: np.ndarray, batch_size: int = 5000):
+    for start in range(0, len(vectors), batch_size):
+        end = min(start + batch_size, len(vectors))
+        collection.upsert(
+            ids=[f"attr_{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=[f"Attribute {i}" for i in range(start, end)],
+            metadatas=[{"prompt": f"Prompt {i}"} for i in range(start, end)],
+        )
+
+
+def measure(collection: Any, queries: np.ndarray, top_k: int) -> Dict[str, Any]:
+    collection.query(query_embeddings=queries[:1].tolist(), n_results=top_k)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=top_k)
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+    }
+
+
+def main(args: argparse.Namespace):
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    results = {}
+    print(f"{'size':>7} {'backend':12} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for size in args.sizes:
+        vectors = random_vectors(size, args.dim, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            chroma = chromadb.PersistentClient(path=tmp).get_or_create_collection(
+                "attributes"
+            )
+            numpy_index = NumpyCollection(os.path.join(tmp, "attributes.numpy"))
+            fill(chroma, vectors)
+            fill(numpy_index, vectors)
+            numpy_index.flush()
+
+            results[size] = {
+                "chroma": measure(chroma, queries, args.top_k),
+                "numpy": measure(numpy_index, queries, args.top_k),
+                # Reopened from disk: the matrix is memory-mapped, not read up front.
+                "numpy (mmap)": measure(
+                    NumpyCollection(os.path.join(tmp, "attributes.numpy")),
+                    queries,
+                    args.top_k,
+                ),
+            }
+        for backend, result in results[size].items():
+            print(
+                f"{size:7d} {backend:12} {result['p50_ms']:8.3f} "
+                f"{result['p95_ms']:8.3f} {result['mean_ms']:8.3f}"
+            )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {"config": vars(args), "cpu_count": os.cpu_count(), "results": results},
+                f,
+                indent=4,
+            )
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--output", default=os.path.join(BASE_DIR, "results", "vector_index.json")
+    )
+    main(parser.parse_args())
@@ -1,13 +1,38 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+import asyncio
+import json
+import math
 import os
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-from typing import List, Optional
-from src.models import PromptGenerationRequest, GeneratedPrompt, SimilarAttribute
-from src.vector_store import VectorStore
+from typing import List, Literal, Optional
+from src.models import (
+    PromptGenerationRequest,
+    GeneratedPrompt,
+    SimilarAttribute,
+    BatchPromptResult,
+)
+from src.vector_store import VectorStore, normalize_attribute_name
 from src.data_loader import load_and_index_data
 from src.generator import PromptGenerator
+from src.cache import ResponseCache
+from src.embeddings import CachedEmbeddingFunction
+from src.singleflight import SingleFlight
+from src.http_client import ConnectionStats, build_http_client
+from src.rate_limiter import LimiterTimeout
+from src.retry import is_retryable, retry_after_seconds
+from src.llm_pool import NoHealthyDeployment
+from src.formatting import (
+    build_prompts,
+    dumps,
+    render_exact_match,
+    serialize_prompts,
+)
+from src.timing import RequestTimingMiddleware, stage
+from src.metrics import PROMPT_SOURCES, ServiceStateCollector
 from src.logger import setup_logging
 
 logger = setup_logging()
@@ -16,87 +41,266 @@ load_dotenv()
 
 vector_store = None
 generator = None
+startup_stage = "starting"
+startup_error = None
+inflight_requests = SingleFlight()
+llm_connection_stats = ConnectionStats()
 
 
-def append_formatting_rules(
-    prompt: str, attribute_name: str, has_fixed_values: Optional[bool]
-) -> str:
-    lines = [prompt]
-    if has_fixed_values:
-        lines.append("Select only from the following allowed values.")
-        lines.append('"allowed_values": {allowed_values}')
+def initialize_data(store: VectorStore):
+    """Syncs the CSV export into ChromaDB on startup, re-indexing only changed rows."""
+    logger.info(f"Vector DB contains {store.count()} items. Syncing from CSVs...")
+    base_dir = os.path.dirname(os.path.dirname(__file__))
 
-    lines.append(
-        '- return the output in {language} language in JSON format {{ "'
-        + attribute_name
-        + '" : <your_classification> }}'
+    files = os.listdir(base_dir)
+    attr_csv = next(
+        (f for f in files if f.startswith("public_attributes_definition_export")),
+        None,
+    )
+    mapper_csv = next(
+        (f for f in files if f.startswith("public_llm_mapper_export")), None
     )
+    prompt_csv = next(
+        (f for f in files if f.startswith("public_llm_prompt_configuration_export")),
+        None,
+    )
+
+    if attr_csv and mapper_csv and prompt_csv:
+        load_and_index_data(
+            attributes_csv=os.path.join(base_dir, attr_csv),
+            mapper_csv=os.path.join(base_dir, mapper_csv),
+            prompt_csv=os.path.join(base_dir, prompt_csv),
+            vector_store=store,
+        )
+        logger.info(f"Vector DB now contains {store.count()} items.")
+    else:
+        logger.warning("CSV files not found in root directory. Skipping data sync.")
+
 
-    lines.append("- Strictly return the JSON object only.")
-    lines.append(
-        "- Do not include markdown formatting, code blocks, escaped characters or explanations."
+def prepare_index():
+    """Opens the vector store, syncs the CSV export and optionally warms the model.
+
+    The store is only published to request handlers once it is fully prepared, so
+    `vector_store is not None` doubles as the readiness signal.
+    """
+    global vector_store, startup_stage
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    db_dir = os.path.join(base_dir, "data", "chroma_db")
+
+    startup_stage = "loading_index"
+    store = VectorStore(
+        persist_directory=db_dir,
+        embedding_function=CachedEmbeddingFunction.from_env(
+            default_path=os.path.join(base_dir, "data", "embedding_cache.npy")
+        ),
     )
 
-    return "\n".join(lines)
+    startup_stage = "syncing_data"
+    initialize_data(store)
 
+    if os.getenv("WARMUP_EMBEDDING", "true").lower() not in ("0", "false", "no"):
+        startup_stage = "warming_up"
+        store.warmup()
 
-def initialize_data():
-    """Loads CSV data into ChromaDB on startup if DB is empty."""
-    global vector_store
-    if vector_store.count() == 0:
-        logger.info("Vector DB is empty. Loading data from CSVs...")
-        base_dir = os.path.dirname(os.path.dirname(__file__))
+    vector_store = store
+    startup_stage = "ready"
+    logger.info("Vector index is ready to serve traffic.")
 
-        files = os.listdir(base_dir)
-        attr_csv = next(
-            (f for f in files if f.startswith("public_attributes_definition_export")),
-            None,
-        )
-        mapper_csv = next(
-            (f for f in files if f.startswith("public_llm_mapper_export")), None
-        )
-        prompt_csv = next(
-            (
-                f
-                for f in files
-                if f.startswith("public_llm_prompt_configuration_export")
-            ),
-            None,
-        )
 
-        if attr_csv and mapper_csv and prompt_csv:
-            load_and_index_data(
-                attributes_csv=os.path.join(base_dir, attr_csv),
-                mapper_csv=os.path.join(base_dir, mapper_csv),
-                prompt_csv=os.path.join(base_dir, prompt_csv),
-                vector_store=vector_store,
-            )
-        else:
-            logger.warning(
-                "CSV files not found in root directory. Skipping initial data load."
-            )
-    else:
-        logger.info(f"Vector DB already contains {vector_store.count()} items.")
+def on_startup_done(task: asyncio.Task):
+    global startup_stage, startup_error
+    if not task.cancelled() and task.exception() is not None:
+        startup_stage = "failed"
+        startup_error = str(task.exception())
+        logger.error(f"Background index preparation failed: {startup_error}")
+
+
+async def refresh_document_count(interval: float):
+    """Periodically re-reads the document count so probes never query ChromaDB."""
+    while True:
+        await asyncio.sleep(interval)
+        if vector_store is None:
+            continue
+        try:
+            await asyncio.to_thread(vector_store.refresh_count)
+        except Exception as e:
+            logger.warning(f"Failed to refresh vector store document count: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global vector_store, generator
+    global generator
     logger.info("Initializing application...")
     base_dir = os.path.dirname(os.path.dirname(__file__))
-    db_dir = os.path.join(base_dir, "data", "chroma_db")
 
-    vector_store = VectorStore(persist_directory=db_dir)
-    generator = PromptGenerator()
+    http_client = build_http_client(llm_connection_stats)
+    generator = PromptGenerator(
+        cache=ResponseCache.from_env(
+            default_path=os.path.join(base_dir, "data", "llm_cache.sqlite3")
+        ),
+        http_client=http_client,
+    )
+
+    startup_task = None
+    if os.getenv("STARTUP_MODE", "blocking").lower() == "background":
+        logger.info("Preparing vector index in the background; serving liveness now.")
+        startup_task = asyncio.create_task(asyncio.to_thread(prepare_index))
+        startup_task.add_done_callback(on_startup_done)
+    else:
+        prepare_index()
 
-    initialize_data()
+    count_refresh_task = None
+    count_refresh_interval = float(
+        os.getenv("VECTOR_STORE_COUNT_REFRESH_SECONDS", "60")
+    )
+    if count_refresh_interval > 0:
+        count_refresh_task = asyncio.create_task(
+            refresh_document_count(count_refresh_interval)
+        )
 
     yield
 
     logger.info("Shutting down application...")
+    if count_refresh_task is not None:
+        count_refresh_task.cancel()
+    if startup_task is not None and not startup_task.done():
+        # The preparation thread cannot be interrupted; let it finish before closing.
+        await asyncio.wait([startup_task])
+    if vector_store is not None:
+        vector_store.close()
+    await generator.aclose()
+    await http_client.aclose()
+    if generator.cache is not None:
+        generator.cache.close()
 
 
 app = FastAPI(title="Attribute Prompt Generator API", lifespan=lifespan)
+app.add_middleware(RequestTimingMiddleware)
+
+
+def ensure_ready():
+    """Rejects generation requests with 503 until the vector index is prepared."""
+    if vector_store is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service is not ready yet (startup stage: {startup_stage}).",
+            headers={"Retry-After": "5"},
+        )
+
+
+def request_key(request: PromptGenerationRequest) -> tuple:
+    """Normalizes a request into the inputs that determine its prompt and system role."""
+    return (
+        normalize_attribute_name(request.attribute_name),
+        request.description or "",
+        bool(request.has_failed),
+    )
+
+
+def resolve_exact_match(
+    request: PromptGenerationRequest, exact_match: Optional[dict]
+) -> Optional[dict]:
+    """Returns the stored prompt when the exact-match bypass applies to the request."""
+    if exact_match is None or request.has_failed:
+        return None
+    logger.info(
+        f"Exact match found in DB for {request.attribute_name}. Bypassing LLM generation."
+    )
+    PROMPT_SOURCES.labels("exact_match").inc()
+    return {
+        "prompt": exact_match["prompt"],
+        "system_role": exact_match["system_role"],
+    }
+
+
+def generation_inputs(
+    request: PromptGenerationRequest,
+    similar_docs: List[dict],
+    distances: List[float],
+    exact_match: Optional[dict],
+) -> dict:
+    """Builds the PromptGenerator arguments for a request from its search results."""
+    existing_failed_prompt = None
+    if exact_match is not None:
+        logger.info(
+            f"Exact match found in DB for {request.attribute_name}, but 'has_failed' is true. "
+            "Passing to LLM for improvement."
+        )
+        existing_failed_prompt = exact_match["prompt"]
+
+    similar_attributes = []
+    for doc, dist in zip(similar_docs, distances):
+        similar_attributes.append(
+            SimilarAttribute(
+                attribute_name=doc["attribute_name"],
+                prompt=doc["prompt"],
+                system_role=doc["system_role"],
+                distance=dist,
+            )
+        )
+
+    logger.info(f"Found {len(similar_attributes)} similar attributes.")
+
+    return {
+        "attribute_name": request.attribute_name,
+        "description": request.description or "",
+        "examples": similar_attributes,
+        "existing_failed_prompt": existing_failed_prompt,
+    }
+
+
+def materialized_response(request: PromptGenerationRequest) -> Optional[bytes]:
+    """Pre-rendered response body for exact matches requested under their stored name."""
+    exact_match = vector_store.get_exact(request.attribute_name)
+    if (
+        exact_match is None
+        or request.has_failed
+        or exact_match["attribute_name"] != request.attribute_name
+    ):
+        return None
+    logger.info(
+        f"Exact match found in DB for {request.attribute_name}. Bypassing LLM generation."
+    )
+    PROMPT_SOURCES.labels("exact_match").inc()
+    with stage("render"):
+        return render_exact_match(exact_match, request.has_fixed_values)
+
+
+async def generate_from_examples(
+    request: PromptGenerationRequest,
+    similar_docs: List[dict],
+    distances: List[float],
+    exact_match: Optional[dict],
+) -> dict:
+    """Generates a prompt with the LLM, using the search results as few-shot examples."""
+    return await generator.generate_prompt(
+        **generation_inputs(request, similar_docs, distances, exact_match)
+    )
+
+
+async def resolve_prompt(request: PromptGenerationRequest) -> dict:
+    """Finds or generates the prompt and system role for a request, before formatting rules."""
+    exact_match = vector_store.get_exact(request.attribute_name)
+    resolved = resolve_exact_match(request, exact_match)
+    if resolved is not None:
+        return resolved
+
+    similar_docs, distances = await vector_store.asearch(
+        query=request.attribute_name, top_k=3
+    )
+    return await generate_from_examples(request, similar_docs, distances, exact_match)
+
+
+def build_response(
+    resolved: dict, request: PromptGenerationRequest
+) -> List[GeneratedPrompt]:
+    with stage("render"):
+        return build_prompts(
+            prompt=resolved["prompt"],
+            system_role=resolved["system_role"],
+            attribute_name=request.attribute_name,
+            has_fixed_values=request.has_fixed_values,
+        )
 
 
 @app.post(
@@ -107,95 +311,304 @@ app = FastAPI(title="Attribute Prompt Generator API", lifespan=lifespan)
     responses={
         500: {
             "description": "Internal server error occurred when generating the prompt or fetching from the vector store."
-        }
+        },
+        503: {
+            "description": "The vector index is still being prepared, no LLM capacity became available before the queue timeout, or every LLM deployment is unhealthy."
+        },
     },
 )
 async def generate_prompt(request: PromptGenerationRequest):
     logger.info(f"Received generation request for attribute: {request.attribute_name}")
+    ensure_ready()
+
+    body = materialized_response(request)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
 
     try:
-        similar_docs, distances = vector_store.search(
-            query=request.attribute_name, top_k=3
+        # Concurrent identical requests share one search and one LLM round-trip.
+        resolved = await inflight_requests.do(
+            request_key(request), lambda: resolve_prompt(request)
+        )
+        if os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes"):
+            # Trusted internal strings: skip response_model validation and encoding.
+            with stage("render"):
+                body = serialize_prompts(
+                    prompt=resolved["prompt"],
+                    system_role=resolved["system_role"],
+                    attribute_name=request.attribute_name,
+                    has_fixed_values=request.has_fixed_values,
+                )
+            return Response(content=body, media_type="application/json")
+        return build_response(resolved, request)
+
+    except (LimiterTimeout, NoHealthyDeployment) as e:
+        logger.warning(f"Rejected generation request, LLM is saturated: {e}")
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "10"}
         )
+    except Exception as e:
+        if is_retryable(e):
+            # Throttling (429) or transient Azure errors that outlasted the retries.
+            retry_after = retry_after_seconds(e)
+            logger.warning(f"LLM unavailable after retries: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={
+                    "Retry-After": str(math.ceil(retry_after) if retry_after else 10)
+                },
+            )
+        logger.error(f"Failed to generate prompt: {e}")
+        # Raise HTTP 500 when Azure OpenAI fails or ChromaDB operations cause unexpected errors
+        raise HTTPException(status_code=500, detail=str(e))
 
-        existing_failed_prompt = None
-
-        if similar_docs and distances:
-            first_doc = similar_docs[0]
-            if first_doc["attribute_name"].lower() == request.attribute_name.lower():
-                if request.has_failed:
-                    logger.info(
-                        f"Exact match found in DB for {request.attribute_name}, but 'has_failed' is true. "
-                        "Passing to LLM for improvement."
-                    )
-                    existing_failed_prompt = first_doc["prompt"]
-                else:
-                    logger.info(
-                        f"Exact match found in DB for {request.attribute_name}. Bypassing LLM generation."
-                    )
-                    final_prompt = append_formatting_rules(
-                        prompt=first_doc["prompt"],
-                        attribute_name=request.attribute_name,
-                        has_fixed_values=request.has_fixed_values,
-                    )
-                    return [
-                        GeneratedPrompt(
-                            prompt=final_prompt,
-                            system_role=first_doc["system_role"],
-                            user_input="all_images",
-                        ),
-                        GeneratedPrompt(
-                            prompt=final_prompt,
-                            system_role=first_doc["system_role"],
-                            user_input="None",
-                        ),
-                    ]
-
-        similar_attributes = []
-        for doc, dist in zip(similar_docs, distances):
-            similar_attributes.append(
-                SimilarAttribute(
-                    attribute_name=doc["attribute_name"],
-                    prompt=doc["prompt"],
-                    system_role=doc["system_role"],
-                    distance=dist,
+
+def format_stream_event(event: str, data, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+@app.post(
+    "/generate-prompt/stream",
+    response_class=StreamingResponse,
+    summary="Generate Attribute Extraction Prompts (Streaming)",
+    description=(
+        "Streaming variant of /generate-prompt. When the LLM path is taken, completion tokens are forwarded "
+        "as 'token' events while they are generated. The stream always ends with either a 'result' event "
+        "carrying the validated List[GeneratedPrompt] (formatting rules appended) or an 'error' event. "
+        "Use format=ndjson (default) for newline-delimited JSON or format=sse for Server-Sent Events."
+    ),
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}, "text/event-stream": {}},
+            "description": "A stream of token events followed by a final result or error event.",
+        },
+        503: {"description": "The vector index is still being prepared."},
+    },
+)
+async def generate_prompt_stream(
+    request: PromptGenerationRequest,
+    format: Literal["ndjson", "sse"] = "ndjson",
+):
+    logger.info(
+        f"Received streaming generation request for attribute: {request.attribute_name}"
+    )
+    ensure_ready()
+
+    async def stream_events():
+        try:
+            exact_match = vector_store.get_exact(request.attribute_name)
+            resolved = resolve_exact_match(request, exact_match)
+            if resolved is None:
+                similar_docs, distances = await vector_store.asearch(
+                    query=request.attribute_name, top_k=3
                 )
+                async for event, data in generator.stream_prompt(
+                    **generation_inputs(request, similar_docs, distances, exact_match)
+                ):
+                    if event == "token":
+                        yield format_stream_event("token", data, format)
+                    else:
+                        resolved = data
+
+            prompts = build_response(resolved, request)
+            yield format_stream_event(
+                "result", [p.model_dump() for p in prompts], format
             )
+        except Exception as e:
+            logger.error(f"Failed to stream prompt: {e}")
+            yield format_stream_event("error", str(e), format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream_events(), media_type=media_type)
 
-        logger.info(f"Found {len(similar_attributes)} similar attributes.")
 
-        generated_data = await generator.generate_prompt(
+async def generate_batch_item(
+    index: int,
+    request: PromptGenerationRequest,
+    similar_docs: List[dict],
+    distances: List[float],
+    llm_slots: asyncio.Semaphore,
+) -> BatchPromptResult:
+    try:
+        exact_match = vector_store.get_exact(request.attribute_name)
+        async with llm_slots:
+            resolved = await inflight_requests.do(
+                request_key(request),
+                lambda: generate_from_examples(
+                    request, similar_docs, distances, exact_match
+                ),
+            )
+        return BatchPromptResult(
+            index=index,
             attribute_name=request.attribute_name,
-            description=request.description or "",
-            examples=similar_attributes,
-            existing_failed_prompt=existing_failed_prompt,
+            prompts=build_response(resolved, request),
+        )
+    except Exception as e:
+        logger.error(f"Failed to generate prompt for batch item {index}: {e}")
+        return BatchPromptResult(
+            index=index, attribute_name=request.attribute_name, error=str(e)
         )
 
-        final_gen_prompt = append_formatting_rules(
-            prompt=generated_data["prompt"],
-            attribute_name=request.attribute_name,
-            has_fixed_values=request.has_fixed_values,
+
+@app.post(
+    "/generate-prompts",
+    response_class=StreamingResponse,
+    summary="Generate Extraction Prompts for Many Attributes",
+    description=(
+        "Batch variant of /generate-prompt. Exact matches are resolved from the in-memory name index "
+        "without embedding, the remaining attribute names are searched in a single vector store query and "
+        "LLM generations run with bounded concurrency. Results are streamed as newline-delimited JSON (one "
+        "BatchPromptResult per line) in completion order; failed items carry an 'error' instead of failing "
+        "the whole batch."
+    ),
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "A stream of BatchPromptResult objects, one per line.",
+        },
+        422: {"description": "The batch is larger than BATCH_MAX_SIZE."},
+        500: {"description": "The vector store search for the batch failed."},
+        503: {"description": "The vector index is still being prepared."},
+    },
+)
+async def generate_prompts(requests: List[PromptGenerationRequest]):
+    logger.info(f"Received batch generation request for {len(requests)} attributes")
+    ensure_ready()
+
+    max_size = int(os.getenv("BATCH_MAX_SIZE", "5000"))
+    if len(requests) > max_size:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch of {len(requests)} items exceeds the limit of {max_size}.",
         )
 
-        return [
-            GeneratedPrompt(
-                prompt=final_gen_prompt,
-                system_role=generated_data["system_role"],
-                user_input="all_images",
-            ),
-            GeneratedPrompt(
-                prompt=final_gen_prompt,
-                system_role=generated_data["system_role"],
-                user_input="None",
-            ),
+    exact_results = []
+    pending = []
+    for i, request in enumerate(requests):
+        body = materialized_response(request)
+        if body is not None:
+            exact_results.append(
+                b'{"index":%d,"attribute_name":%s,"prompts":%s,"error":null}\n'
+                % (
+                    i,
+                    dumps(request.attribute_name),
+                    body,
+                )
+            )
+            continue
+
+        resolved = resolve_exact_match(
+            request, vector_store.get_exact(request.attribute_name)
+        )
+        if resolved is not None:
+            exact_results.append(
+                BatchPromptResult(
+                    index=i,
+                    attribute_name=request.attribute_name,
+                    prompts=build_response(resolved, request),
+                ).model_dump_json()
+                + "\n"
+            )
+        else:
+            pending.append((i, request))
+
+    search_results = []
+    if pending:
+        try:
+            search_results = await vector_store.asearch_many(
+                [request.attribute_name for _, request in pending], top_k=3
+            )
+        except Exception as e:
+            logger.error(f"Failed to search vector store for batch: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    llm_slots = asyncio.Semaphore(int(os.getenv("BATCH_LLM_CONCURRENCY", "8")))
+
+    async def stream_results():
+        for line in exact_results:
+            yield line
+
+        tasks = [
+            asyncio.create_task(generate_batch_item(i, request, docs, dists, llm_slots))
+            for (i, request), (docs, dists) in zip(pending, search_results)
         ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield result.model_dump_json() + "\n"
+        finally:
+            # Client went away mid-stream: stop the remaining generations.
+            for task in tasks:
+                task.cancel()
 
-    except Exception as e:
-        logger.error(f"Failed to generate prompt: {e}")
-        # Raise HTTP 500 when Azure OpenAI fails or ChromaDB operations cause unexpected errors
-        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.get("/health/live", summary="Liveness probe")
+def liveness_check():
+    return {"status": "ok"}
+
+
+@app.get(
+    "/health/ready",
+    summary="Readiness probe",
+    responses={503: {"description": "The vector index is still being prepared."}},
+)
+def readiness_check():
+    if vector_store is None:
+        return JSONResponse(
+            status_code=503,
+            content={"status": startup_stage, "error": startup_error},
+        )
+    return {"status": "ready"}
+
+
+def metrics_state() -> dict:
+    return {
+        "vector_store_documents": vector_store.count() if vector_store else None,
+        "llm_deployments": generator.limiter_stats() if generator else None,
+        "llm_cache": generator.cache_stats() if generator else None,
+        "embedding_cache": vector_store.embedding_stats() if vector_store else None,
+    }
+
+
+REGISTRY.register(ServiceStateCollector(metrics_state))
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/health")
-def health_check():
-    return {"status": "ok", "db_count": vector_store.count() if vector_store else 0}
+async def health_check():
+    # Only in-memory state: probes must not touch ChromaDB or the worker threads.
+    return {
+        "status": "ok",
+        "ready": vector_store is not None,
+        "startup_stage": startup_stage,
+        "model_loaded": vector_store.model_loaded if vector_store else False,
+        "db_count": vector_store.count() if vector_store else 0,
+        "db_count_age_seconds": (
+            round(vector_store.count_age(), 1) if vector_store else None
+        ),
+        "llm_circuits": (
+            {
+                name: stats["circuit"]
+                for name, stats in generator.limiter_stats().items()
+            }
+            if generator
+            else None
+        ),
+        "search_executor": vector_store.executor_stats() if vector_store else None,
+        "embedding_cache": vector_store.embedding_stats() if vector_store else None,
+        "llm_cache": generator.cache_stats() if generator else None,
+        "single_flight": inflight_requests.stats(),
+        "llm_http": llm_connection_stats.stats(),
+        "llm_deployments": generator.limiter_stats() if generator else None,
+        "llm_retries": generator.retry_stats() if generator else None,
+    }
@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite on disk) cache for parsed LLM responses.
+
+    Entries are content-addressed: the key is a hash of everything that determines
+    the completion, so a cache hit is interchangeable with a fresh LLM call.
+
+    Async callers use `aget`/`aset`: the memory tier is answered on the event loop,
+    while SQLite reads and writes run on a single background thread. The disk row
+    count is tracked rather than counted, and the disk tier is trimmed in batches
+    (a tenth of `max_disk_entries`) and purged of expired rows every
+    `purge_interval` seconds instead of on every insert.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 50_000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        purge_interval: float = 60.0,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval = purge_interval
+
+        self._lock = threading.Lock()  # memory tier and stats; held only briefly
+        self._db_lock = threading.Lock()  # the SQLite connection
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        self._db = None
+        self._disk = None
+        self._disk_entries = 0
+        self._purged_at = 0.0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)"
+            )
+            self._db.commit()
+            (self._disk_entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+            self._disk = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="llm-cache"
+            )
+
+        logger.info(
+            f"Initialized LLM response cache (memory={max_memory_entries}, "
+            f"disk={max_disk_entries if path else 0}, ttl={ttl_seconds}s, path={path})"
+        )
+
+    @classmethod
+    def from_env(cls, default_path: Optional[str] = None) -> Optional["ResponseCache"]:
+        """Builds a cache from LLM_CACHE_* environment variables, or None if disabled."""
+        if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", default_path) or None,
+            max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024")),
+            max_disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", "50000")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        )
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str) -> str:
+        """Hashes the fully rendered prompts together with the deployment name."""
+        digest = hashlib.sha256()
+        for part in (model, system_prompt, user_prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+        if value is None and self._db is not None:
+            value = self._get_disk(key, now)
+        return self._result(value)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """`get` that never blocks the event loop on SQLite."""
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+        if value is None and self._disk is not None:
+            value = await asyncio.get_running_loop().run_in_executor(
+                self._disk, self._get_disk, key, now
+            )
+        return self._result(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        serialized = json.dumps(value)
+        with self._lock:
+            self._remember(key, now, serialized)
+        if self._db is not None:
+            self._set_disk(key, serialized, now)
+
+    def aset(self, key: str, value: Dict[str, Any]):
+        """`set` that writes the disk tier in the background; safe on the event loop."""
+        now = time.time()
+        serialized = json.dumps(value)
+        with self._lock:
+            self._remember(key, now, serialized)
+        if self._disk is not None:
+            self._disk.submit(self._set_disk, key, serialized, now).add_done_callback(
+                self._log_write_error
+            )
+
+    @staticmethod
+    def _log_write_error(future: Future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to write LLM response to the disk cache: {error}")
+
+    def _result(self, value: Optional[str]) -> Optional[Dict[str, Any]]:
+        if value is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        return json.loads(value)
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, value = entry
+        if now - created_at <= self.ttl_seconds:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return value
+        del self._memory[key]
+        self._stats["expired"] += 1
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            fresh = now - created_at <= self.ttl_seconds
+            if fresh:
+                self._db.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+            else:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._disk_entries -= 1
+            self._db.commit()
+
+        with self._lock:
+            if not fresh:
+                self._stats["expired"] += 1
+                return None
+            self._remember(key, created_at, value)
+            self._stats["disk_hits"] += 1
+            return value
+
+    def _set_disk(self, key: str, serialized: str, now: float):
+        with self._db_lock:
+            if self._db is None:
+                return
+            updated = self._db.execute(
+                "UPDATE responses SET value = ?, created_at = ?, accessed_at = ? "
+                "WHERE key = ?",
+                (serialized, now, now, key),
+            ).rowcount
+            if not updated:
+                self._db.execute(
+                    "INSERT INTO responses (key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, serialized, now, now),
+                )
+                self._disk_entries += 1
+            self._evict_disk(now)
+            self._db.commit()
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        expired = evicted = 0
+        if now - self._purged_at >= self.purge_interval:
+            expired = max(
+                self._db.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (now - self.ttl_seconds,),
+                ).rowcount,
+                0,
+            )
+            self._disk_entries -= expired
+            self._purged_at = now
+
+        overflow = self._disk_entries - self.max_disk_entries
+        if overflow > 0:
+            # Trim below the bound so the next eviction is a batch of inserts away.
+            overflow += self.max_disk_entries // 10
+            evicted = max(
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount,
+                0,
+            )
+            self._disk_entries -= evicted
+
+        if expired or evicted:
+            with self._lock:
+                self._stats["expired"] += expired
+                self._stats["evictions"] += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries,
+            }
+
+    def close(self):
+        disk, self._disk = self._disk, None
+        if disk is not None:
+            # Pending background writes land before the connection closes.
+            disk.shutdown(wait=True)
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
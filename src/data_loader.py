@@ -1,15 +1,71 @@
 import pandas as pd
+import hashlib
 import json
+import time
+from typing import Optional
 from src.vector_store import VectorStore
 from src.logger import setup_logging
 
 logger = setup_logging()
 
 
+def _loads_or_none(raw: str):
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_arguments(arguments: pd.Series) -> pd.DataFrame:
+    """Parses the JSON `arguments` column into `prompt` and `system_role` columns.
+
+    Each distinct payload is decoded once; rows with invalid JSON get empty values.
+    """
+    unique_args = arguments.dropna().astype(str).unique()
+    decoded = [_loads_or_none(raw) for raw in unique_args]
+
+    prompts = {}
+    system_roles = {}
+    for raw, args in zip(unique_args, decoded):
+        if isinstance(args, dict):
+            prompts[raw] = args.get("prompt") or ""
+            system_roles[raw] = args.get("system_role") or ""
+
+    as_str = arguments.where(arguments.isna(), arguments.astype(str))
+    return pd.DataFrame(
+        {
+            "prompt": as_str.map(prompts).fillna(""),
+            "system_role": as_str.map(system_roles).fillna(""),
+        },
+        index=arguments.index,
+    )
+
+
+def content_hash(prompt: str, system_role: str, attribute_name: str) -> str:
+    """Fingerprint of the indexed content of a row, used to detect changes between exports."""
+    digest = hashlib.sha256()
+    for part in (prompt, system_role, attribute_name):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
 def load_and_index_data(
-    attributes_csv: str, mapper_csv: str, prompt_csv: str, vector_store: VectorStore
+    attributes_csv: str,
+    mapper_csv: str,
+    prompt_csv: str,
+    vector_store: VectorStore,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    delete_missing: bool = True,
 ):
+    """Syncs the CSV export into the vector store.
+
+    Only rows whose content hash differs from the stored one are re-embedded and
+    upserted; documents absent from the export are deleted when `delete_missing`.
+    """
     logger.info("Loading CSVs...")
+    started_at = time.perf_counter()
     try:
         df_attrs = pd.read_csv(attributes_csv)
         df_mapper = pd.read_csv(mapper_csv)
@@ -25,41 +81,62 @@ def load_and_index_data(
     df_final = df_merged.merge(df_attrs_uniq, on="attribute_id", how="inner")
     df_final = df_final.drop_duplicates(subset=["attribute_name"])
 
-    ids = []
-    texts = []
-    metadatas = []
-
-    for _, row in df_final.iterrows():
-        attr_name = row["attribute_name"]
-
-        if pd.isna(attr_name):
-            continue
-
-        attr_name = str(attr_name).strip()
-
-        args_str = row["arguments"]
-        prompt_text = ""
-
-        if pd.notna(args_str):
-            try:
-                args = json.loads(args_str)
-                prompt_text = args.get("prompt", "")
-                system_role = args.get("system_role", "")
-            except json.JSONDecodeError:
-                pass
-
-        if prompt_text:
-            ids.append(f"attr_{attr_name.lower().replace(' ', '_')}")
-            texts.append(attr_name)
-            metadatas.append(
-                {
-                    "prompt": prompt_text,
-                    "system_role": system_role,
-                    "original_id": str(row["attribute_id"]),
-                }
+    df_final = df_final[df_final["attribute_name"].notna()]
+    df_final = df_final.assign(
+        attribute_name=df_final["attribute_name"].astype(str).str.strip()
+    )
+    df_final = df_final.join(parse_arguments(df_final["arguments"]))
+    df_final = df_final[df_final["prompt"].astype(bool)]
+
+    df_final = df_final.assign(
+        id="attr_" + df_final["attribute_name"].str.lower().str.replace(" ", "_"),
+        original_id=df_final["attribute_id"].astype(str),
+    )
+    # Names that only differed by surrounding whitespace collapse onto the same ID.
+    df_final = df_final.drop_duplicates(subset=["id"])
+
+    df_final = df_final.assign(
+        content_hash=[
+            content_hash(prompt, system_role, name)
+            for prompt, system_role, name in zip(
+                df_final["prompt"], df_final["system_role"], df_final["attribute_name"]
             )
+        ]
+    )
+
+    logger.info(
+        f"Found {len(df_final)} attributes with prompts in export "
+        f"(prepared in {time.perf_counter() - started_at:.2f}s)."
+    )
+
+    existing_hashes = vector_store.get_content_hashes()
+    # After an embedding backend change every stored vector is stale, not just
+    # the rows whose content changed.
+    current_hashes = {} if vector_store.embeddings_stale else existing_hashes
+    changed = df_final[df_final["content_hash"] != df_final["id"].map(current_hashes)]
+
+    removed = []
+    if delete_missing and df_final.empty:
+        logger.warning("Export contains no indexable rows; not deleting anything.")
+    elif delete_missing:
+        removed = sorted(set(existing_hashes) - set(df_final["id"]))
 
-    logger.info(f"Found {len(texts)} attributes with prompts to index.")
+    logger.info(
+        f"Sync plan: {len(changed)} new or changed, {len(removed)} removed, "
+        f"{len(df_final) - len(changed)} unchanged."
+    )
 
-    vector_store.add_texts(ids=ids, texts=texts, metadatas=metadatas)
-    logger.info("Indexing complete.")
+    vector_store.delete(removed)
+    vector_store.add_texts(
+        ids=changed["id"].tolist(),
+        texts=changed["attribute_name"].tolist(),
+        metadatas=changed[
+            ["prompt", "system_role", "original_id", "content_hash"]
+        ].to_dict("records"),
+        batch_size=batch_size,
+        workers=workers,
+    )
+    # Stored rows that were neither re-embedded nor deleted keep their old vectors.
+    if not set(existing_hashes) - set(removed) - set(changed["id"]):
+        vector_store.mark_embeddings_current()
+    logger.info(f"Indexing complete in {time.perf_counter() - started_at:.2f}s.")
@@ -0,0 +1,268 @@
+import os
+import threading
+from functools import cached_property
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+BACKENDS = ("onnx", "sentence-transformers", "chroma")
+# Vectors from ChromaDB's stock embedding function, including collections built
+# before signatures were recorded.
+CHROMA_DEFAULT_SIGNATURE = f"chroma:{ONNXMiniLM_L6_V2.MODEL_NAME}"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class locked_cached_property(cached_property):
+    """`cached_property` computed under the instance's `_init_lock`.
+
+    The first embeddings of a cold start come from several ingestion threads at
+    once; without the lock each would download, quantize and load the model.
+    Once computed, the value lives in the instance dict and is read without locking.
+    """
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with instance._init_lock:
+            return super().__get__(instance, owner)
+
+
+class ChromaDefaultEmbedding:
+    """ChromaDB's stock embedding function (all-MiniLM-L6-v2, 256-token padding)
+    with a single shared model.
+
+    chromadb's `DefaultEmbeddingFunction` builds a new `ONNXMiniLM_L6_V2`, and with it
+    a new InferenceSession, on every call. This keeps one instance, downloaded and
+    loaded once under a lock, and returns the same vectors.
+    """
+
+    signature = CHROMA_DEFAULT_SIGNATURE
+
+    def __init__(self):
+        self._init_lock = threading.RLock()
+
+    @locked_cached_property
+    def model(self) -> ONNXMiniLM_L6_V2:
+        model = ONNXMiniLM_L6_V2()
+        model._download_model_if_not_exists()
+        model.tokenizer, model.model  # load both before concurrent callers use them
+        logger.info("Loaded ChromaDB default embedding model")
+        return model
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        return self.model(input)
+
+
+class OnnxEmbedding:
+    """all-MiniLM-L6-v2 on onnxruntime, tuned for short texts such as attribute names.
+
+    Uses the model files ChromaDB downloads for its default embedding function, but
+    pads each batch to its longest text instead of always to 256 tokens, truncates at
+    `max_seq_length`, pins the intra-op thread count and can run int8 weights
+    (dynamically quantized once and stored next to the original model).
+    """
+
+    def __init__(
+        self,
+        threads: int = 0,
+        max_seq_length: int = 128,
+        batch_size: int = 64,
+        quantize: bool = False,
+    ):
+        self.threads = threads
+        self.max_seq_length = max_seq_length
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self._init_lock = threading.RLock()
+        self.signature = (
+            f"onnx:{ONNXMiniLM_L6_V2.MODEL_NAME}:{'int8' if quantize else 'fp32'}"
+        )
+
+    @locked_cached_property
+    def _model_dir(self) -> str:
+        chroma_model = ONNXMiniLM_L6_V2()
+        chroma_model._download_model_if_not_exists()
+        return os.path.join(
+            chroma_model.DOWNLOAD_PATH, chroma_model.EXTRACTED_FOLDER_NAME
+        )
+
+    @locked_cached_property
+    def tokenizer(self) -> Any:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(os.path.join(self._model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.max_seq_length)
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    @locked_cached_property
+    def session(self) -> Any:
+        import onnxruntime as ort
+
+        model_path = os.path.join(self._model_dir, "model.onnx")
+        if self.quantize:
+            model_path = self._quantized(model_path)
+
+        options = ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        logger.info(
+            f"Loaded ONNX embedding model {os.path.basename(model_path)} "
+            f"(threads={self.threads or 'auto'}, max_seq_length={self.max_seq_length})"
+        )
+        return session
+
+    @staticmethod
+    def _quantized(model_path: str) -> str:
+        quantized_path = model_path.replace(".onnx", ".int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {model_path} to int8 weights")
+            # Per-process temp file: several workers may quantize on first start.
+            tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for start in range(0, len(input), self.batch_size):
+            encoded = self.tokenizer.encode_batch(
+                list(input[start : start + self.batch_size])
+            )
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array(
+                [e.attention_mask for e in encoded], dtype=np.int64
+            )
+            last_hidden_state = self.session.run(
+                None,
+                {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "token_type_ids": np.zeros_like(input_ids),
+                },
+            )[0]
+
+            # Mean pooling over real tokens, as sentence-transformers does.
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (last_hidden_state * mask).sum(axis=1) / np.clip(
+                mask.sum(axis=1), 1e-9, None
+            )
+            vectors.extend(_normalize(pooled))
+        return vectors
+
+
+class SentenceTransformerEmbedding:
+    """sentence-transformers model on CPU, optionally with int8 dynamic quantization."""
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        threads: int = 0,
+        max_seq_length: int = 128,
+        batch_size: int = 64,
+        quantize: bool = False,
+    ):
+        self.model_name = model_name
+        self.threads = threads
+        self.max_seq_length = max_seq_length
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self._init_lock = threading.RLock()
+        self.signature = (
+            f"sentence-transformers:{model_name}:{'int8' if quantize else 'fp32'}"
+        )
+
+    @locked_cached_property
+    def model(self) -> Any:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name, device="cpu")
+        model.max_seq_length = self.max_seq_length
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        logger.info(
+            f"Loaded sentence-transformers model {self.model_name} "
+            f"(threads={self.threads or 'auto'}, max_seq_length={self.max_seq_length}, "
+            f"int8={self.quantize})"
+        )
+        return model
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        embeddings = self.model.encode(
+            list(input),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return list(embeddings.astype(np.float32))
+
+
+def embedding_backend(
+    backend: str = "chroma",
+    model_name: Optional[str] = None,
+    threads: int = 0,
+    max_seq_length: int = 128,
+    batch_size: int = 64,
+    quantize: bool = False,
+) -> Callable[[List[str]], List[np.ndarray]]:
+    """Builds an embedding function for one of `BACKENDS`.
+
+    "chroma" is ChromaDB's stock default (256-token padding, no tuning options) and
+    the default until the tuned backends are benchmarked against the real model.
+    """
+    if backend == "onnx":
+        return OnnxEmbedding(
+            threads=threads,
+            max_seq_length=max_seq_length,
+            batch_size=batch_size,
+            quantize=quantize,
+        )
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedding(
+            model_name=model_name or "sentence-transformers/all-MiniLM-L6-v2",
+            threads=threads,
+            max_seq_length=max_seq_length,
+            batch_size=batch_size,
+            quantize=quantize,
+        )
+    if backend == "chroma":
+        return ChromaDefaultEmbedding()
+    raise ValueError(
+        f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}"
+    )
+
+
+def embedding_backend_from_env() -> Callable[[List[str]], List[np.ndarray]]:
+    """Builds the embedding function from EMBEDDING_* environment variables."""
+    return embedding_backend(
+        backend=os.getenv("EMBEDDING_BACKEND", "chroma").lower(),
+        model_name=os.getenv("EMBEDDING_MODEL") or None,
+        threads=int(os.getenv("EMBEDDING_THREADS", "0")),
+        max_seq_length=int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "128")),
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+        quantize=os.getenv("EMBEDDING_QUANTIZE", "false").lower()
+        in ("1", "true", "yes"),
+    )
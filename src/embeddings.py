@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from src.embedding_backends import embedding_backend_from_env
+from src.logger import setup_logging
+from src.microbatch import MicroBatcher
+
+logger = setup_logging()
+
+
+class CachedEmbeddingFunction:
+    """Bounded LRU of text -> embedding in front of an embedding function.
+
+    Follows ChromaDB's convention: ``__call__`` embeds documents (passed straight
+    through, so bulk ingestion does not flush the cache) and ``embed_query`` embeds
+    search queries through the cache. Vectors are kept in a contiguous float32
+    matrix which, when ``persist_path`` is set, is loaded from and saved to a
+    ``.npy`` file so the cache survives restarts. The matrix is always a private
+    in-memory copy, so processes sharing the file never write into each other's rows.
+
+    With ``microbatch_wait_ms`` set, cache misses from concurrent queries are merged
+    into one forward pass by a ``MicroBatcher``.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Optional[Callable[[List[str]], Any]] = None,
+        max_entries: int = 10_000,
+        persist_path: Optional[str] = None,
+        lowercase: bool = True,
+        microbatch_wait_ms: float = 0.0,
+        microbatch_max_items: int = 32,
+    ):
+        # all-MiniLM-L6-v2 is uncased, so case does not change its embeddings.
+        self.embedding_function = embedding_function or embedding_backend_from_env()
+        # Persisted vectors are only reused by the backend configuration that made them.
+        self.signature = getattr(self.embedding_function, "signature", None)
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.lowercase = lowercase
+
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.model_loaded = False
+        self._batcher = (
+            MicroBatcher(self, microbatch_wait_ms, microbatch_max_items)
+            if microbatch_wait_ms > 0
+            else None
+        )
+
+        if persist_path:
+            self._load()
+
+    @classmethod
+    def from_env(
+        cls,
+        embedding_function: Optional[Callable[[List[str]], Any]] = None,
+        default_path: Optional[str] = None,
+    ) -> "CachedEmbeddingFunction":
+        """Builds a cache from EMBEDDING_CACHE_* environment variables."""
+        persist = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() not in (
+            "0",
+            "false",
+            "no",
+        )
+        return cls(
+            embedding_function=embedding_function,
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+            persist_path=(
+                os.getenv("EMBEDDING_CACHE_PATH", default_path) if persist else None
+            ),
+            microbatch_wait_ms=float(os.getenv("EMBEDDING_MICROBATCH_WAIT_MS", "0")),
+            microbatch_max_items=int(os.getenv("EMBEDDING_MICROBATCH_MAX_ITEMS", "32")),
+        )
+
+    def limit_microbatch_callers(self, callers: int):
+        """Releases micro-batches once `callers` concurrent queries have joined.
+
+        Queries are embedded from a fixed pool of search threads, so no more than
+        that many can ever be waiting for the same batch.
+        """
+        if self._batcher is not None:
+            self._batcher.max_callers = callers
+
+    def _key(self, text: str) -> str:
+        key = " ".join(text.split())
+        return key.lower() if self.lowercase else key
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = [
+            np.asarray(v, dtype=np.float32) for v in self.embedding_function(input)
+        ]
+        self.model_loaded = True
+        return vectors
+
+    def embed_query(self, input: List[str]) -> List[np.ndarray]:
+        keys = [self._key(text) for text in input]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self._slots.move_to_end(key)
+                    results[i] = np.array(self._vectors[slot])
+                    self.hits += 1
+                elif key in missing:
+                    # Repeated within the same call: served by the same inference.
+                    missing[key].append(i)
+                    self.hits += 1
+                else:
+                    missing[key] = [i]
+                    self.misses += 1
+
+        if missing:
+            # One forward pass for every distinct miss in the call (and, when
+            # micro-batching, in the concurrent calls that joined it).
+            embed = self._batcher or self
+            vectors = embed([input[positions[0]] for positions in missing.values()])
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), vectors):
+                    self._store(key, vector)
+                    for i in positions:
+                        results[i] = vector
+
+        return results
+
+    def _store(self, key: str, vector: np.ndarray):
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._allocate(vector.shape[0])
+
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+            self._slots[key] = slot
+        self._slots.move_to_end(key)
+        self._vectors[slot] = vector
+
+    def _allocate(self, dim: int):
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._slots.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    @property
+    def _keys_path(self) -> str:
+        return self.persist_path + ".keys.json"
+
+    @staticmethod
+    def _digest(vectors: np.ndarray) -> str:
+        return hashlib.blake2b(np.ascontiguousarray(vectors).data).hexdigest()
+
+    def _load(self):
+        if not (os.path.exists(self.persist_path) and os.path.exists(self._keys_path)):
+            return
+        try:
+            vectors = np.load(self.persist_path)
+            with open(self._keys_path) as f:
+                keys = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable embedding cache: {e}")
+            return
+        if not isinstance(keys, dict) or keys.get("digest") != self._digest(vectors):
+            # Written by an older version, or the process stopped between the two
+            # file replacements in `flush` (or another process flushed in between).
+            logger.info(
+                "Embedding cache files do not match, starting with an empty cache."
+            )
+            return
+        if keys.get("signature") != self.signature:
+            logger.info(
+                "Embedding backend changed, starting with an empty embedding cache."
+            )
+            return
+        if vectors.dtype != np.float32 or vectors.shape[0] != self.max_entries:
+            logger.info("Embedding cache size changed, starting with an empty cache.")
+            return
+
+        self._vectors = vectors
+        self._slots = OrderedDict((key, slot) for key, slot in keys["keys"])
+        used = set(self._slots.values())
+        self._free_slots = [
+            slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used
+        ]
+        logger.info(f"Loaded {len(self._slots)} cached embeddings")
+
+    def flush(self):
+        """Saves the vectors and the key -> row mapping to disk.
+
+        Both files are replaced atomically and the mapping records a digest of the
+        vectors it belongs to, so a torn pair is detected on load and discarded.
+        """
+        if not self.persist_path or self._vectors is None:
+            return
+        with self._lock:
+            vectors = self._vectors.copy()
+            keys = {
+                "signature": self.signature,
+                "digest": self._digest(vectors),
+                "keys": list(self._slots.items()),
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(self.persist_path)), exist_ok=True)
+        suffix = f".{os.getpid()}.tmp"
+        with open(self.persist_path + suffix, "wb") as f:
+            np.save(f, vectors)
+        with open(self._keys_path + suffix, "w") as f:
+            json.dump(keys, f)
+        os.replace(self.persist_path + suffix, self.persist_path)
+        os.replace(self._keys_path + suffix, self._keys_path)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "model_loaded": self.model_loaded,
+            "microbatch": self._batcher.stats() if self._batcher else None,
+        }
+
+    def close(self):
+        self.flush()
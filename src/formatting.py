@@ -0,0 +1,117 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from src.models import GeneratedPrompt
+
+try:
+    import orjson
+except ImportError:  # optional: `uv sync --extra fast-json`
+    orjson = None
+
+PROMPTS_TEMPLATE = (
+    b'[{"prompt":%s,"system_role":%s,"user_input":"all_images"},'
+    b'{"prompt":%s,"system_role":%s,"user_input":"None"}]'
+)
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes to compact UTF-8 JSON, matching FastAPI's JSONResponse output."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def append_formatting_rules(
+    prompt: str, attribute_name: str, has_fixed_values: Optional[bool]
+) -> str:
+    lines = [prompt]
+    if has_fixed_values:
+        lines.append("Select only from the following allowed values.")
+        lines.append('"allowed_values": {allowed_values}')
+
+    lines.append(
+        '- return the output in {language} language in JSON format {{ "'
+        + attribute_name
+        + '" : <your_classification> }}'
+    )
+
+    lines.append("- Strictly return the JSON object only.")
+    lines.append(
+        "- Do not include markdown formatting, code blocks, escaped characters or explanations."
+    )
+
+    return "\n".join(lines)
+
+
+def build_prompts(
+    prompt: str,
+    system_role: str,
+    attribute_name: str,
+    has_fixed_values: Optional[bool],
+) -> List[GeneratedPrompt]:
+    """Builds the image-context and text-only variants returned for every request."""
+    final_prompt = append_formatting_rules(
+        prompt=prompt,
+        attribute_name=attribute_name,
+        has_fixed_values=has_fixed_values,
+    )
+
+    return [
+        GeneratedPrompt(
+            prompt=final_prompt,
+            system_role=system_role,
+            user_input="all_images",
+        ),
+        GeneratedPrompt(
+            prompt=final_prompt,
+            system_role=system_role,
+            user_input="None",
+        ),
+    ]
+
+
+def serialize_prompts(
+    prompt: str,
+    system_role: str,
+    attribute_name: str,
+    has_fixed_values: Optional[bool],
+) -> bytes:
+    """Serializes the same body as `build_prompts` without building models.
+
+    Inputs are trusted internal strings, so validation is skipped and the final
+    prompt, shared by both variants, is encoded only once.
+    """
+    final_prompt = dumps(
+        append_formatting_rules(
+            prompt=prompt,
+            attribute_name=attribute_name,
+            has_fixed_values=has_fixed_values,
+        )
+    )
+    role = dumps(system_role)
+    return PROMPTS_TEMPLATE % (final_prompt, role, final_prompt, role)
+
+
+def render_exact_match(
+    entry: Dict[str, Any], has_fixed_values: Optional[bool]
+) -> bytes:
+    """Returns the serialized /generate-prompt response body for an exact-match entry.
+
+    The body is rendered once per (entry, has_fixed_values) variant and memoized on
+    the index entry, so repeated hits skip formatting and serialization.
+    Upserts replace the entry, which drops its rendered bodies with it.
+    """
+    rendered = entry.setdefault("rendered", {})
+    key = bool(has_fixed_values)
+    body = rendered.get(key)
+    if body is None:
+        body = serialize_prompts(
+            prompt=entry["prompt"],
+            system_role=entry["system_role"],
+            attribute_name=entry["attribute_name"],
+            has_fixed_values=key,
+        )
+        rendered[key] = body
+    return body
@@ -1,39 +1,52 @@
+import json
 import os
-from typing import List, Optional
-from openai import AsyncAzureOpenAI
+import time
+from typing import AsyncIterator, List, Optional, Tuple, Union
+import httpx
+from openai import RateLimitError
+from src.cache import ResponseCache
+from src.http_client import build_http_client
+from src.llm_pool import Deployment, DeploymentPool, NoHealthyDeployment
+from src.rate_limiter import Permit
+from src.retry import RetryPolicy, is_retryable
 from src.models import SimilarAttribute
+from src.metrics import LLM_TOKENS, PROMPT_SOURCES
+from src.timing import record_stage
 from src.logger import setup_logging
 
 logger = setup_logging()
 
 
 class PromptGenerator:
-    def __init__(self):
-        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-
-        if not self.api_key or not self.endpoint:
-            logger.warning(
-                "AZURE_OPENAI_API_KEY or AZURE_OPENAI_ENDPOINT environment variable not set. LLM generation may fail if not provided in environment."
-            )
-        self.client = AsyncAzureOpenAI(
-            api_key=self.api_key,
-            azure_endpoint=self.endpoint,
-            api_version=self.api_version,
-        )
+    max_tokens = 1500
 
-    async def generate_prompt(
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        pool: Optional[DeploymentPool] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        # How long a call may spend queueing and retrying when the caller sets no deadline.
+        self.queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+        # A client passed in is shared with the caller, who is responsible for closing it.
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or build_http_client()
+        self.pool = pool or DeploymentPool.from_env(self.http_client)
+        # Cache namespace; every deployment in the pool serves the same model.
+        self.deployment = self.pool.model
+
+    def build_messages(
         self,
         attribute_name: str,
         description: str,
         examples: List[SimilarAttribute],
         existing_failed_prompt: Optional[str] = None,
-    ) -> dict:
-        """
-        Generates a prompt for a new attribute using few-shot examples.
-        Returns a dictionary with 'prompt' and 'system_role'.
-        """
+    ) -> Tuple[str, str]:
+        """Renders the system and user prompts sent to the LLM."""
         system_prompt = (
             "You are an expert prompt engineer for an e-commerce platform. "
             "Your task is to write high-quality extraction prompts for product attributes.\n"
@@ -61,21 +74,248 @@ class PromptGenerator:
 
         user_prompt += "\nNow, based on the patterns in the examples, generate the extraction prompt and system role for the new attribute in JSON format."
 
+        return system_prompt, user_prompt
+
+    def _completion_kwargs(self, system_prompt: str, user_prompt: str) -> dict:
+        return {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.2,
+            "max_tokens": self.max_tokens,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _estimate_tokens(self, system_prompt: str, user_prompt: str) -> int:
+        # ~4 characters per token for the prompt, plus the completion budget.
+        return (len(system_prompt) + len(user_prompt)) // 4 + self.max_tokens
+
+    async def _create(
+        self,
+        deployment: Deployment,
+        permit: Permit,
+        system_prompt: str,
+        user_prompt: str,
+        **kwargs,
+    ):
+        started_at = time.monotonic()
         try:
-            response = await self.client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.2,
-                max_tokens=1500,
-                response_format={"type": "json_object"},
+            response = await deployment.client.chat.completions.create(
+                **self._completion_kwargs(system_prompt, user_prompt),
+                model=deployment.deployment,
+                **kwargs,
             )
-            import json
+        except Exception as e:
+            self._record_error(deployment, permit, e)
+            raise
+        finally:
+            if not kwargs.get("stream"):
+                record_stage("llm", time.monotonic() - started_at)
+        deployment.breaker.record_success()
+        if not kwargs.get("stream"):
+            self.retry_policy.latency.record(time.monotonic() - started_at)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            permit.used_tokens = usage.total_tokens
+            self._record_usage(deployment, usage)
+        return response
+
+    @staticmethod
+    def _record_error(deployment: Deployment, permit: Permit, error: Exception):
+        if isinstance(error, RateLimitError):
+            permit.overloaded = True
+        # Caller errors (e.g. 400) say nothing about the deployment's health.
+        if is_retryable(error):
+            deployment.breaker.record_failure()
+
+    @staticmethod
+    def _record_usage(deployment: Deployment, usage):
+        LLM_TOKENS.labels(deployment.name, "prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(deployment.name, "completion").inc(usage.completion_tokens)
+
+    async def _attempt(self, system_prompt: str, user_prompt: str, deadline: float):
+        """One LLM call on the least-loaded healthy deployment.
+
+        Transient failures fail over to the next deployment straight away; the
+        retry policy only backs off once every deployment has been tried. Each call
+        holds its own limiter slot, so hedges are rate limited too.
+        """
+        tried = []
+        last_error = None
+        while True:
+            try:
+                with self.pool.use(exclude=tried) as deployment:
+                    try:
+                        async with deployment.limiter.slot(
+                            self._estimate_tokens(system_prompt, user_prompt), deadline
+                        ) as permit:
+                            return await self._create(
+                                deployment, permit, system_prompt, user_prompt
+                            )
+                    except Exception as e:
+                        tried.append(deployment.name)
+                        if not is_retryable(e) or len(tried) == len(
+                            self.pool.deployments
+                        ):
+                            raise
+                        last_error = e
+                        logger.warning(
+                            f"LLM call failed on {deployment.name}, failing over: {e}"
+                        )
+            except NoHealthyDeployment:
+                # Every untried deployment has an open circuit: surface the transient
+                # error instead, so the retry policy backs off and tries again.
+                if last_error is None:
+                    raise
+                raise last_error
+
+    async def _cached(
+        self, system_prompt: str, user_prompt: str
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """Returns the cache key for the rendered prompts and the cached response, if any."""
+        if self.cache is None:
+            return None, None
+        cache_key = ResponseCache.make_key(self.deployment, system_prompt, user_prompt)
+        return cache_key, await self.cache.aget(cache_key)
 
+    async def generate_prompt(
+        self,
+        attribute_name: str,
+        description: str,
+        examples: List[SimilarAttribute],
+        existing_failed_prompt: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        """
+        Generates a prompt for a new attribute using few-shot examples.
+        Returns a dictionary with 'prompt' and 'system_role'.
+        `deadline` (time.monotonic() seconds) bounds how long the call may queue for LLM capacity.
+        """
+        system_prompt, user_prompt = self.build_messages(
+            attribute_name=attribute_name,
+            description=description,
+            examples=examples,
+            existing_failed_prompt=existing_failed_prompt,
+        )
+
+        cache_key, cached = await self._cached(system_prompt, user_prompt)
+        if cached is not None:
+            logger.info(f"LLM cache hit for attribute: {attribute_name}")
+            PROMPT_SOURCES.labels("llm_cache").inc()
+            return cached
+
+        deadline = deadline or time.monotonic() + self.queue_timeout
+        try:
+            response = await self.retry_policy.run(
+                lambda: self._attempt(system_prompt, user_prompt, deadline),
+                deadline,
+                # Hedging while callers queue for capacity would only add load.
+                hedge=self.retry_policy.hedge and self.pool.waiting() == 0,
+            )
             content = response.choices[0].message.content.strip()
-            return json.loads(content)
+            generated = json.loads(content)
         except Exception as e:
             logger.error(f"Error generating prompt with LLM: {e}")
             raise
+
+        PROMPT_SOURCES.labels("llm").inc()
+        if cache_key is not None:
+            self.cache.aset(cache_key, generated)
+        return generated
+
+    async def stream_prompt(
+        self,
+        attribute_name: str,
+        description: str,
+        examples: List[SimilarAttribute],
+        existing_failed_prompt: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[str, Union[str, dict]]]:
+        """
+        Streaming variant of generate_prompt.
+        Yields ("token", text) for each content delta as it arrives from the LLM, then a
+        single ("result", dict) with the parsed 'prompt' and 'system_role'.
+        """
+        system_prompt, user_prompt = self.build_messages(
+            attribute_name=attribute_name,
+            description=description,
+            examples=examples,
+            existing_failed_prompt=existing_failed_prompt,
+        )
+
+        cache_key, cached = await self._cached(system_prompt, user_prompt)
+        if cached is not None:
+            logger.info(f"LLM cache hit for attribute: {attribute_name}")
+            PROMPT_SOURCES.labels("llm_cache").inc()
+            yield "result", cached
+            return
+
+        deadline = deadline or time.monotonic() + self.queue_timeout
+        parts = []
+        try:
+            # The stream stays on one deployment and holds its slot until fully consumed.
+            with self.pool.use() as deployment:
+                async with deployment.limiter.slot(
+                    self._estimate_tokens(system_prompt, user_prompt), deadline
+                ) as permit:
+                    started_at = time.monotonic()
+                    # Only establishing the stream is retried; tokens already sent cannot be.
+                    stream = await self.retry_policy.run(
+                        lambda: self._create(
+                            deployment,
+                            permit,
+                            system_prompt,
+                            user_prompt,
+                            stream=True,
+                            stream_options={"include_usage": True},
+                        ),
+                        deadline,
+                        hedge=False,
+                    )
+                    try:
+                        # Closing returns the connection to the shared pool, also when
+                        # the client disconnects mid-stream.
+                        async with stream:
+                            async for chunk in stream:
+                                # Usage arrives on a final chunk without choices.
+                                if getattr(chunk, "usage", None) is not None:
+                                    permit.used_tokens = chunk.usage.total_tokens
+                                    self._record_usage(deployment, chunk.usage)
+                                if not chunk.choices:
+                                    continue
+                                delta = chunk.choices[0].delta.content
+                                if delta:
+                                    if not parts:
+                                        record_stage(
+                                            "llm_ttft", time.monotonic() - started_at
+                                        )
+                                    parts.append(delta)
+                                    yield "token", delta
+                    except Exception as e:
+                        self._record_error(deployment, permit, e)
+                        raise
+                    record_stage("llm", time.monotonic() - started_at)
+            generated = json.loads("".join(parts).strip())
+        except Exception as e:
+            logger.error(f"Error streaming prompt from LLM: {e}")
+            raise
+
+        PROMPT_SOURCES.labels("llm").inc()
+        if cache_key is not None:
+            self.cache.aset(cache_key, generated)
+        yield "result", generated
+
+    async def aclose(self):
+        if self._owns_http_client:
+            await self.http_client.aclose()
+
+    def limiter_stats(self) -> dict:
+        """Per-deployment limiter and circuit breaker state."""
+        return self.pool.stats()
+
+    def retry_stats(self) -> dict:
+        return self.retry_policy.stats()
+
+    def cache_stats(self) -> Optional[dict]:
+        return self.cache.stats() if self.cache is not None else None
@@ -0,0 +1,76 @@
+import importlib.util
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+
+def llm_timeout() -> httpx.Timeout:
+    """Per-phase timeouts for LLM calls, from LLM_*_TIMEOUT environment variables (seconds)."""
+    return httpx.Timeout(
+        connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+        read=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+        write=float(os.getenv("LLM_WRITE_TIMEOUT", "10")),
+        pool=float(os.getenv("LLM_POOL_TIMEOUT", "10")),
+    )
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections to tell how often connections are reused."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self.new_connections += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": reused,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+        }
+
+
+def build_http_client(stats: Optional[ConnectionStats] = None) -> httpx.AsyncClient:
+    """Builds the pooled keep-alive client shared by every LLM call in the process.
+
+    HTTP/2 is used when LLM_HTTP2 is enabled and the optional `h2` package is installed.
+    """
+    http2 = os.getenv("LLM_HTTP2", "true").lower() not in ("0", "false", "no")
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.info("h2 is not installed; using HTTP/1.1 for LLM calls.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+    logger.info(
+        f"Initialized LLM HTTP client (http2={http2}, "
+        f"max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections})"
+    )
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=limits,
+        timeout=llm_timeout(),
+        event_hooks={"request": [stats.on_request]} if stats else None,
+    )
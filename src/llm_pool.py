@@ -0,0 +1,217 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+from openai import AsyncAzureOpenAI
+
+from src.http_client import llm_timeout
+from src.logger import setup_logging
+from src.rate_limiter import LLMRateLimiter, TokenBucket
+
+logger = setup_logging()
+
+
+class NoHealthyDeployment(Exception):
+    """Raised when every deployment in the pool has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets a single trial
+    call through once `reset_timeout` seconds have passed (half-open)."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial: Optional[object] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def trial_in_flight(self) -> bool:
+        return self._trial is not None
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_in_flight)
+
+    def on_call(self) -> Optional[object]:
+        """Takes the half-open trial slot, returning a token for `release_trial`."""
+        if self.state == "half_open":
+            self._trial = object()
+            return self._trial
+        return None
+
+    def release_trial(self, token: Optional[object]):
+        """Frees the trial slot if the call holding `token` ended without an outcome
+        (a caller error, no limiter capacity or cancellation)."""
+        if token is not None and self._trial is token:
+            self._trial = None
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("Opening LLM circuit breaker after repeated failures")
+            self.opened_at = time.monotonic()
+        self._trial = None
+
+
+class Deployment:
+    """One Azure OpenAI endpoint + deployment, with its own quota limiter and breaker."""
+
+    def __init__(
+        self,
+        endpoint: Optional[str],
+        deployment: str,
+        api_key: Optional[str],
+        api_version: str,
+        http_client: httpx.AsyncClient,
+        weight: float = 1.0,
+        name: Optional[str] = None,
+        limiter: Optional[LLMRateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.weight = weight
+        self.name = (
+            name or f"{urlparse(endpoint or '').hostname or 'default'}/{deployment}"
+        )
+        self.limiter = limiter or LLMRateLimiter.from_env()
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        )
+        self.client = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            http_client=http_client,
+            timeout=llm_timeout(),
+            # Retries and failover are handled by the generator so that 429s reach the limiter.
+            max_retries=0,
+        )
+
+    def load(self) -> float:
+        """Outstanding work relative to the deployment's share of traffic."""
+        return (self.limiter.in_flight + self.limiter.waiting + 1) / self.weight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deployment": self.deployment,
+            "weight": self.weight,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            **self.limiter.stats(),
+        }
+
+
+class DeploymentPool:
+    """Routes each LLM call to the least-loaded healthy deployment."""
+
+    def __init__(self, deployments: List[Deployment]):
+        if not deployments:
+            raise ValueError("DeploymentPool needs at least one deployment")
+        self.deployments = deployments
+
+    @classmethod
+    def from_env(cls, http_client: httpx.AsyncClient) -> "DeploymentPool":
+        """Builds the pool from AZURE_OPENAI_DEPLOYMENTS (a JSON list), or from the
+        single-endpoint AZURE_OPENAI_* variables when it is not set.
+
+        Each list entry takes `endpoint`, `deployment`, and optionally `name`, `weight`,
+        `api_key` (or `api_key_env`), `api_version`, `rpm` and `tpm`. All entries are
+        expected to serve the same model.
+        """
+        default_key = os.getenv("AZURE_OPENAI_API_KEY")
+        default_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        default_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+
+        configs = json.loads(os.getenv("AZURE_OPENAI_DEPLOYMENTS") or "[]")
+        if not configs:
+            configs = [{"endpoint": os.getenv("AZURE_OPENAI_ENDPOINT")}]
+
+        deployments = []
+        for config in configs:
+            limiter = LLMRateLimiter.from_env()
+            # Per-deployment quotas override the global LLM_RPM_LIMIT / LLM_TPM_LIMIT.
+            if "rpm" in config:
+                limiter.requests = TokenBucket(config["rpm"]) if config["rpm"] else None
+            if "tpm" in config:
+                limiter.tokens = TokenBucket(config["tpm"]) if config["tpm"] else None
+            api_key = config.get("api_key") or (
+                os.getenv(config["api_key_env"])
+                if config.get("api_key_env")
+                else default_key
+            )
+            if not api_key or not config.get("endpoint"):
+                logger.warning(
+                    "AZURE_OPENAI_API_KEY or AZURE_OPENAI_ENDPOINT environment variable not set. LLM generation may fail if not provided in environment."
+                )
+            deployments.append(
+                Deployment(
+                    endpoint=config.get("endpoint"),
+                    deployment=config.get("deployment", default_deployment),
+                    api_key=api_key,
+                    api_version=config.get("api_version", default_version),
+                    http_client=http_client,
+                    weight=float(config.get("weight", 1.0)),
+                    name=config.get("name"),
+                    limiter=limiter,
+                )
+            )
+
+        logger.info(f"Initialized LLM deployment pool: {[d.name for d in deployments]}")
+        return cls(deployments)
+
+    @property
+    def model(self) -> str:
+        return self.deployments[0].deployment
+
+    def choose(self, exclude: Iterable[str] = ()) -> Deployment:
+        excluded = set(exclude)
+        candidates = [
+            d
+            for d in self.deployments
+            if d.name not in excluded and d.breaker.available()
+        ]
+        if not candidates:
+            raise NoHealthyDeployment(
+                "No healthy Azure OpenAI deployment available "
+                f"({len(excluded)} of {len(self.deployments)} already tried)"
+            )
+        return min(candidates, key=Deployment.load)
+
+    @contextmanager
+    def use(self, exclude: Iterable[str] = ()) -> Iterator[Deployment]:
+        """Chooses a deployment for one call, holding its half-open trial slot (if
+        the call is the trial) until the block exits, however it exits."""
+        deployment = self.choose(exclude)
+        trial = deployment.breaker.on_call()
+        try:
+            yield deployment
+        finally:
+            deployment.breaker.release_trial(trial)
+
+    def waiting(self) -> int:
+        return sum(d.limiter.waiting for d in self.deployments)
+
+    def stats(self) -> Dict[str, Any]:
+        return {d.name: d.stats() for d in self.deployments}
@@ -1,12 +1,24 @@
 """Setup logging utilities for the application."""
 
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
 from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, TextIO, Tuple
 
 import structlog
 import json
 
+try:
+    import orjson
+except ImportError:  # optional: `uv sync --extra fast-json`
+    orjson = None
+
 ORDER = [
     "timestamp",
     "level",
@@ -17,6 +29,15 @@ ORDER = [
     "logger",
 ]
 
+_configured = False
+_srcfile = logging._srcfile
+_record_flags = (logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+_listener: Optional[logging.handlers.QueueListener] = None
+# None outside requests (always logged); per-request sampling decision otherwise.
+_request_sampled: ContextVar[Optional[bool]] = ContextVar(
+    "log_request_sampled", default=None
+)
+
 
 def _dumps(event_dict, **kwargs):
     out = {}
@@ -29,25 +50,118 @@ def _dumps(event_dict, **kwargs):
     return json.dumps(out, **kwargs)
 
 
-def setup_logging() -> structlog.BoundLogger:
-    """Set up and configure logging for the application with structlog.
+def _orjson_renderer(logger, method_name, event_dict) -> str:
+    out = {key: event_dict.pop(key) for key in ORDER if key in event_dict}
+    out.update(event_dict)
+    return orjson.dumps(out, default=repr).decode()
 
-    Uses JSON formatting for structured logging output, integrating stdlib logging.
 
-    Returns:
-        structlog.BoundLogger: Configured structlog logger.
+class CachedCallsiteAdder:
+    """Adds filename, module and lineno like `CallsiteParameterAdder`, caching them
+    per call site so each log call only walks up to the first application frame."""
+
+    def __init__(self):
+        self._cache: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+
+    def __call__(self, logger, method_name, event_dict):
+        record = event_dict.get("_record")
+        if record is not None:  # stdlib record: the callsite is already known
+            event_dict["filename"] = record.filename
+            event_dict["module"] = record.module
+            event_dict["lineno"] = record.lineno
+            return event_dict
+
+        frame = sys._getframe(1)
+        while frame.f_globals.get("__name__", "").startswith(("structlog", "logging")):
+            frame = frame.f_back
+        key = (frame.f_code, frame.f_lineno)
+        params = self._cache.get(key)
+        if params is None:
+            filename = os.path.basename(frame.f_code.co_filename)
+            params = {
+                "filename": filename,
+                "module": os.path.splitext(filename)[0],
+                "lineno": frame.f_lineno,
+            }
+            self._cache[key] = params
+        event_dict.update(params)
+        return event_dict
+
+
+def _sample_info(logger, method_name, event_dict):
+    if method_name == "info" and _request_sampled.get() is False:
+        raise structlog.DropEvent
+    return event_dict
+
+
+def sample_request_logs():
+    """Decides once per request whether its info-level logs are kept.
+
+    Keeps LOG_INFO_SAMPLE_RATE of requests with all their info lines, so sampled
+    requests stay readable end to end. Warnings and errors are always logged.
+    """
+    rate = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+    _request_sampled.set(rate >= 1.0 or random.random() < rate)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as-is so rendering happens on the listener thread too."""
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(
+    callsite: str = "full",
+    renderer: str = "json",
+    use_queue: bool = False,
+    stream: Optional[TextIO] = None,
+):
+    """Configures structlog and the root logger.
+
+    Args:
+        callsite: "full" inspects the stack on every call, "cached" caches the
+            callsite per code location and "off" skips filename/module/lineno.
+        renderer: "json" (stdlib) or "orjson" (falls back to "json" if missing).
+        use_queue: Renders and writes on a QueueListener thread instead of the caller.
+        stream: Output stream, stdout by default.
     """
+    global _listener
+
+    if callsite == "off":
+        # High-throughput mode: stdlib records skip their own stack walk and the
+        # thread/process fields the renderer never emits. This is process-wide, so
+        # the default modes leave the stdlib settings alone.
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+        logging._srcfile = None
+    else:
+        (
+            logging.logThreads,
+            logging.logProcesses,
+            logging.logMultiprocessing,
+        ) = _record_flags
+        logging._srcfile = _srcfile
+
+    if callsite == "full":
+        callsite_processors = [
+            structlog.processors.CallsiteParameterAdder(
+                {
+                    structlog.processors.CallsiteParameter.FILENAME,
+                    structlog.processors.CallsiteParameter.MODULE,
+                    structlog.processors.CallsiteParameter.LINENO,
+                }
+            )
+        ]
+    elif callsite == "cached":
+        callsite_processors = [CachedCallsiteAdder()]
+    else:
+        callsite_processors = []
+
     shared_processors = [
         structlog.contextvars.merge_contextvars,
         structlog.stdlib.add_log_level,
         structlog.stdlib.add_logger_name,
-        structlog.processors.CallsiteParameterAdder(
-            {
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.MODULE,
-                structlog.processors.CallsiteParameter.LINENO,
-            }
-        ),
+        *callsite_processors,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
@@ -55,24 +169,38 @@ def setup_logging() -> structlog.BoundLogger:
     ]
 
     structlog.configure(
-        processors=shared_processors
+        processors=[_sample_info]
+        + shared_processors
         + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         context_class=OrderedDict,
         cache_logger_on_first_use=True,
     )
+    if renderer == "orjson" and orjson is not None:
+        render = _orjson_renderer
+    else:
+        render = structlog.processors.JSONRenderer(serializer=_dumps)
     formatter = structlog.stdlib.ProcessorFormatter(
         foreign_pre_chain=shared_processors,
         processors=[
             structlog.stdlib.ProcessorFormatter.remove_processors_meta,
-            structlog.processors.JSONRenderer(serializer=_dumps),
+            render,
         ],
     )
 
-    handler = logging.StreamHandler(sys.stdout)
+    handler = logging.StreamHandler(stream or sys.stdout)
     handler.setFormatter(formatter)
 
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if use_queue:
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        handler = _DeferredQueueHandler(records)
+
     root_logger = logging.getLogger()
     if root_logger.handlers:
         for h in root_logger.handlers[:]:
@@ -81,4 +209,35 @@ def setup_logging() -> structlog.BoundLogger:
     root_logger.addHandler(handler)
     root_logger.setLevel(logging.INFO)
 
+
+def flush_logging():
+    """Drains queued log records, e.g. before the process exits."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(flush_logging)
+
+
+def setup_logging() -> structlog.BoundLogger:
+    """Set up and configure logging for the application with structlog.
+
+    Uses JSON formatting for structured logging output, integrating stdlib logging.
+    Configuration comes from LOG_CALLSITE, LOG_RENDERER and LOG_ASYNC and is applied
+    once per process; later calls only return the logger.
+
+    Returns:
+        structlog.BoundLogger: Configured structlog logger.
+    """
+    global _configured
+    if not _configured:
+        configure_logging(
+            callsite=os.getenv("LOG_CALLSITE", "full").lower(),
+            renderer=os.getenv("LOG_RENDERER", "json").lower(),
+            use_queue=os.getenv("LOG_ASYNC", "false").lower() in ("1", "true", "yes"),
+        )
+        _configured = True
+
     return structlog.get_logger("product_augmentation")
@@ -0,0 +1,117 @@
+"""Prometheus metrics shared across the service."""
+
+from typing import Any, Callable, Dict, Iterator
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+# Sub-millisecond embedding lookups up to minute-long LLM calls.
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "prompt_stage_duration_seconds",
+    "Time spent in each stage of a request (embed, search, parse, llm, render, ...).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUESTS = Counter(
+    "http_requests",
+    "HTTP requests by route, method and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and method, until the response body is sent.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+PROMPT_SOURCES = Counter(
+    "prompt_resolutions",
+    "Prompts resolved by source: exact_match (LLM bypassed), llm_cache or llm.",
+    ["source"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "LLM token usage reported in response.usage.",
+    ["deployment", "type"],
+)
+
+
+class ServiceStateCollector(Collector):
+    """Exposes point-in-time service state at scrape time.
+
+    `state` returns the same stats dicts `/health` reports: `vector_store_documents`,
+    `llm_deployments`, `llm_cache` and `embedding_cache` (None while not initialized).
+    """
+
+    def __init__(self, state: Callable[[], Dict[str, Any]]):
+        self.state = state
+
+    def collect(self) -> Iterator[Metric]:
+        state = self.state()
+
+        if state.get("vector_store_documents") is not None:
+            yield GaugeMetricFamily(
+                "vector_store_documents",
+                "Documents in the vector index.",
+                value=state["vector_store_documents"],
+            )
+
+        deployments = state.get("llm_deployments") or {}
+        gauges = {
+            "in_flight": GaugeMetricFamily(
+                "llm_in_flight_requests",
+                "LLM calls currently holding a limiter slot.",
+                labels=["deployment"],
+            ),
+            "waiting": GaugeMetricFamily(
+                "llm_waiting_requests",
+                "Callers queued for LLM capacity.",
+                labels=["deployment"],
+            ),
+            "concurrency_limit": GaugeMetricFamily(
+                "llm_concurrency_limit",
+                "Current adaptive concurrency limit.",
+                labels=["deployment"],
+            ),
+        }
+        circuit_open = GaugeMetricFamily(
+            "llm_circuit_open",
+            "1 while the deployment's circuit breaker keeps it out of rotation.",
+            labels=["deployment"],
+        )
+        for name, stats in deployments.items():
+            for key, gauge in gauges.items():
+                gauge.add_metric([name], stats[key])
+            circuit_open.add_metric([name], float(stats["circuit"] != "closed"))
+        if deployments:
+            yield from gauges.values()
+            yield circuit_open
+
+        for cache in ("llm_cache", "embedding_cache"):
+            stats = state.get(cache)
+            if stats is None:
+                continue
+            for key in ("hits", "misses"):
+                yield CounterMetricFamily(
+                    f"{cache}_{key}", f"Lookups that were {key}.", value=stats[key]
+                )
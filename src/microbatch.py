@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """Merges concurrent calls of a batch function into one call.
+
+    Callers on different threads (the vector search workers) hand in their texts and
+    block on a future. The first caller of a window becomes the leader: it waits up to
+    `max_wait_ms`, or until `max_items` texts are pending, then runs `fn` once on the
+    distinct texts of everyone who joined and resolves each caller's future with its
+    own slice. A lone caller therefore pays at most `max_wait_ms` extra.
+
+    With `max_callers` (the number of threads that can call concurrently), the batch
+    is also released as soon as that many callers have joined, since nobody else
+    can arrive before the wait expires.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[str]], List[Any]],
+        max_wait_ms: float = 2.0,
+        max_items: int = 32,
+        max_callers: Optional[int] = None,
+    ):
+        self.fn = fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max_items
+        self.max_callers = max_callers
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[List[str], Future]] = []
+        self._pending_items = 0
+        self._leader_waiting = False
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def __call__(self, input: List[str]) -> List[Any]:
+        texts = list(input)
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((texts, future))
+            self._pending_items += len(texts)
+            leader = not self._leader_waiting
+            if leader:
+                self._leader_waiting = True
+            elif self._full():
+                self._cond.notify()
+
+        if leader:
+            deadline = time.monotonic() + self.max_wait
+            with self._cond:
+                while not self._full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+                self._pending_items = 0
+                self._leader_waiting = False
+            self._run(batch)
+
+        return future.result()
+
+    def _full(self) -> bool:
+        return self._pending_items >= self.max_items or (
+            self.max_callers is not None and len(self._pending) >= self.max_callers
+        )
+
+    def _run(self, batch: List[Tuple[List[str], Future]]):
+        # Concurrent requests often miss on the same name; embed it once.
+        unique = list(dict.fromkeys(text for texts, _ in batch for text in texts))
+        try:
+            vectors = dict(zip(unique, self.fn(unique)))
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._cond:
+            self.batches += 1
+            self.items += len(unique)
+            self.largest_batch = max(self.largest_batch, len(unique))
+        for texts, future in batch:
+            future.set_result([vectors[text] for text in texts])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_items": self.max_items,
+            "max_callers": self.max_callers,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": (
+                round(self.items / self.batches, 2) if self.batches else 0.0
+            ),
+            "largest_batch": self.largest_batch,
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class PromptGenerationRequest(BaseModel):
@@ -56,3 +56,20 @@ class GeneratedPrompt(BaseModel):
         description="Optional value controlling how the targeted system handles input variations (e.g. 'all_images').",
         examples=["all_images"],
     )
+
+
+class BatchPromptResult(BaseModel):
+    """A single line of the streamed batch response, emitted as soon as its item completes."""
+
+    index: int = Field(
+        description="Position of the corresponding request in the submitted batch"
+    )
+    attribute_name: str = Field(description="The requested attribute name")
+    prompts: Optional[List[GeneratedPrompt]] = Field(
+        default=None,
+        description="The generated prompts, identical in shape to the /generate-prompt response. Null when the item failed.",
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Error message when this item could not be generated. Other items are unaffected.",
+    )
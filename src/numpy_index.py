@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+
+class NumpyCollection:
+    """Brute-force vector index over a contiguous float32 matrix.
+
+    Implements the subset of ChromaDB's collection API `VectorStore` uses (`upsert`,
+    `get`, `query`, `delete`, `count`, `modify`, `metadata`), so it can stand in for
+    the SQLite + HNSW round-trip on catalogs small enough for one matrix product per
+    query.
+
+    Embeddings are stored L2-normalized and distances are squared L2 (`2 - 2 * cos`),
+    like ChromaDB's default space. With a `path`, the matrix is saved as `vectors.npy`
+    next to an `entries.json` of ids, documents and metadata on `flush()`, and
+    memory-mapped on load (after checking the pair belongs together) until the first
+    write.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._size = 0
+        self._writable = True
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self.metadata: Optional[Dict[str, Any]] = None
+        self._dirty = False
+
+        if path:
+            self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _entries_path(self) -> str:
+        return os.path.join(self.path, "entries.json")
+
+    @staticmethod
+    def _digest(vectors: np.ndarray) -> str:
+        return hashlib.blake2b(np.ascontiguousarray(vectors).data).hexdigest()
+
+    def _load(self):
+        if not (
+            os.path.exists(self._vectors_path) and os.path.exists(self._entries_path)
+        ):
+            return
+        try:
+            with open(self._entries_path) as f:
+                entries = json.load(f)
+            vectors = np.load(self._vectors_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable vector index: {e}")
+            return
+        if len(entries.get("ids", ())) != vectors.shape[0] or entries.get(
+            "digest"
+        ) != self._digest(vectors):
+            # The process stopped between the two file replacements in `flush`, or
+            # another worker flushed in between: rows and ids may not line up.
+            logger.warning(
+                f"Vector index files in {self.path} do not match, starting empty"
+            )
+            return
+        self._vectors = vectors
+        self._size = len(entries["ids"])
+        self._writable = False
+        self._ids = entries["ids"]
+        self._documents = entries["documents"]
+        self._metadatas = entries["metadatas"]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self.metadata = entries.get("metadata")
+        logger.info(f"Loaded {self._size} vectors from {self._vectors_path}")
+
+    def flush(self):
+        """Writes the index to `path` if it changed since the last flush.
+
+        Both files are replaced atomically from per-process temp files, and
+        `entries.json` records a digest of the matrix it belongs to, so a torn pair
+        is detected on load and discarded.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            vectors = (
+                self._vectors[: self._size]
+                if self._vectors is not None
+                else np.zeros((0, 0), dtype=np.float32)
+            )
+            suffix = f".{os.getpid()}.tmp"
+            with open(self._vectors_path + suffix, "wb") as f:
+                np.save(f, vectors)
+            with open(self._entries_path + suffix, "w") as f:
+                json.dump(
+                    {
+                        "ids": self._ids,
+                        "documents": self._documents,
+                        "metadatas": self._metadatas,
+                        "metadata": self.metadata,
+                        "digest": self._digest(vectors),
+                    },
+                    f,
+                )
+            os.replace(self._vectors_path + suffix, self._vectors_path)
+            os.replace(self._entries_path + suffix, self._entries_path)
+            self._dirty = False
+
+    def _reserve(self, rows: int, dim: int):
+        """Makes room for `rows` rows in a writable in-memory matrix."""
+        if self._vectors is not None and self._vectors.shape[1] not in (0, dim):
+            raise ValueError(
+                f"Embedding dimension {dim} does not match the index ({self._vectors.shape[1]})"
+            )
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._writable and capacity >= rows and capacity:
+            return
+        # Grow geometrically; readers keep the previous matrix until they finish.
+        vectors = np.zeros((max(rows, capacity * 2, 1024), dim), dtype=np.float32)
+        if self._size:
+            vectors[: self._size] = self._vectors[: self._size]
+        self._vectors = vectors
+        self._writable = True
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[Any],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix = matrix / np.clip(
+            np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None
+        )
+
+        with self._lock:
+            new_ids = [
+                doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._rows
+            ]
+            self._reserve(self._size + len(new_ids), matrix.shape[1])
+            if len(new_ids) < len(set(ids)):
+                # Existing rows change: write into a copy, since running queries hold
+                # a view of the current matrix. Appended rows lie past their view.
+                self._vectors = self._vectors.copy()
+
+            # Copy-on-write lists, so a concurrent query keeps a consistent view.
+            doc_ids, docs, metas = (
+                list(self._ids),
+                list(self._documents),
+                list(self._metadatas),
+            )
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(doc_ids)
+                    self._rows[doc_id] = row
+                    doc_ids.append(doc_id)
+                    docs.append(None)
+                    metas.append(None)
+                self._vectors[row] = matrix[i]
+                docs[row] = documents[i] if documents else None
+                metas[row] = metadatas[i] if metadatas else None
+
+            self._ids, self._documents, self._metadatas = doc_ids, docs, metas
+            self._size = len(doc_ids)
+            self._dirty = True
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            removed = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not removed:
+                return
+            keep = [row for row in range(self._size) if row not in removed]
+            # A compacted copy: queries running on the old matrix are unaffected.
+            self._vectors = np.array(self._vectors[keep], dtype=np.float32)
+            self._writable = True
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._size = len(self._ids)
+            self._dirty = True
+
+    def modify(self, metadata: Optional[Dict[str, Any]] = None):
+        """Replaces the collection-level metadata, like ChromaDB's `modify`."""
+        with self._lock:
+            self.metadata = metadata
+            self._dirty = True
+
+    def count(self) -> int:
+        return self._size
+
+    def get(
+        self,
+        include: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas"]
+        ids, documents, metadatas = self._ids, self._documents, self._metadatas
+        end = len(ids) if limit is None else offset + limit
+        page = {"ids": ids[offset:end]}
+        if "documents" in include:
+            page["documents"] = documents[offset:end]
+        if "metadatas" in include:
+            page["metadatas"] = metadatas[offset:end]
+        return page
+
+    def query(
+        self, query_embeddings: List[Any], n_results: int = 10, **kwargs
+    ) -> Dict[str, Any]:
+        """Exact top-k by cosine similarity: one matrix product and an argpartition."""
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size] if size else None
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, size)
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        queries = queries / np.clip(
+            np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None
+        )
+        scores = queries @ vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        distances = 2.0 - 2.0 * np.take_along_axis(top_scores, order, axis=1)
+
+        for rows, dists in zip(top.tolist(), distances.tolist()):
+            results["ids"].append([ids[row] for row in rows])
+            results["documents"].append([documents[row] for row in rows])
+            results["metadatas"].append([metadatas[row] for row in rows])
+            results["distances"].append([max(d, 0.0) for d in dists])
+        return results
@@ -0,0 +1,189 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+
+class LimiterTimeout(Exception):
+    """Raised when a call could not get LLM capacity before its deadline."""
+
+
+class TokenBucket:
+    """Refills continuously at `rate_per_minute`, holding at most one minute of budget."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        # A single call larger than the whole budget may go once the bucket is full.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def adjust(self, amount: float):
+        """Takes (positive) or returns (negative) budget; the balance may go negative."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Permit:
+    """Handed to the caller while it holds an LLM slot, to report how the call went."""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+        self.overloaded = False
+
+
+class LLMRateLimiter:
+    """Requests/tokens-per-minute budgets combined with AIMD concurrency control.
+
+    The concurrency limit grows by roughly one per round of successful calls and is
+    cut multiplicatively when the service answers 429 or latency exceeds the target,
+    so in-flight calls settle near what the deployment can actually sustain. Callers
+    queue until capacity is available or their deadline passes.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        initial_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        latency_target: float = 30.0,
+        backoff_ratio: float = 0.5,
+    ):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.timed_out = 0
+        self._condition = asyncio.Condition()
+
+    @classmethod
+    def from_env(cls) -> "LLMRateLimiter":
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_RPM_LIMIT", "0")) or None,
+            tokens_per_minute=float(os.getenv("LLM_TPM_LIMIT", "0")) or None,
+            initial_concurrency=int(os.getenv("LLM_INITIAL_CONCURRENCY", "16")),
+            min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+            latency_target=float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "30")),
+        )
+
+    def _wait_time(self, estimated_tokens: int, now: float) -> float:
+        if self.in_flight >= int(self.limit):
+            return math.inf  # woken up by a release
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.time_until(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.time_until(estimated_tokens, now))
+        return wait
+
+    async def acquire(self, estimated_tokens: int, deadline: float) -> Permit:
+        """Waits for a concurrency slot and enough budget; `deadline` is in time.monotonic() seconds."""
+        async with self._condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(estimated_tokens, now)
+                    if wait == 0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise LimiterTimeout(
+                            "Timed out waiting for LLM capacity "
+                            f"({self.in_flight} in flight, limit {int(self.limit)})"
+                        )
+                    try:
+                        await asyncio.wait_for(
+                            self._condition.wait(), timeout=min(wait, remaining)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self.waiting -= 1
+
+            self.in_flight += 1
+            if self.requests is not None:
+                self.requests.adjust(1)
+            if self.tokens is not None:
+                self.tokens.adjust(estimated_tokens)
+            return Permit(estimated_tokens)
+
+    async def release(self, permit: Permit, latency: float):
+        async with self._condition:
+            self.in_flight -= 1
+            if self.tokens is not None and permit.used_tokens is not None:
+                self.tokens.adjust(permit.used_tokens - permit.estimated_tokens)
+
+            if permit.overloaded:
+                self.throttled += 1
+                self._decrease("429 from LLM")
+            elif latency > self.latency_target:
+                self._decrease(f"latency {latency:.1f}s above target")
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+    def _decrease(self, reason: str):
+        previous = int(self.limit)
+        self.limit = max(self.min_concurrency, self.limit * self.backoff_ratio)
+        if int(self.limit) != previous:
+            logger.warning(
+                f"Reducing LLM concurrency limit {previous} -> {int(self.limit)} ({reason})"
+            )
+
+    @asynccontextmanager
+    async def slot(
+        self, estimated_tokens: int, deadline: float
+    ) -> AsyncIterator[Permit]:
+        permit = await self.acquire(estimated_tokens, deadline)
+        started_at = time.monotonic()
+        try:
+            yield permit
+        finally:
+            # Shielded so a cancelled caller still gives its slot back.
+            await asyncio.shield(self.release(permit, time.monotonic() - started_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "timed_out": self.timed_out,
+            "requests_budget": self.requests.tokens if self.requests else None,
+            "tokens_budget": self.tokens.tokens if self.tokens else None,
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+from src.logger import setup_logging
+
+logger = setup_logging()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Reads the server's requested wait from `retry-after-ms` or `retry-after`, if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, fed by the caller."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class RetryPolicy:
+    """Retries transient LLM failures and optionally hedges slow attempts.
+
+    Waits honor the server's Retry-After when given, otherwise use exponential
+    backoff with full jitter. No attempt is started if the wait would cross the
+    caller's deadline. With hedging enabled, an attempt still running after the
+    observed p95 latency gets a duplicate and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8")),
+            hedge=os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes"),
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1")),
+        )
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+    async def run(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        deadline: float,
+        hedge: Optional[bool] = None,
+    ) -> T:
+        """Runs `attempt` until it succeeds, fails permanently or runs out of time.
+
+        `deadline` is in time.monotonic() seconds.
+        """
+        hedge = self.hedge if hedge is None else hedge
+        retry = 0
+        while True:
+            try:
+                if hedge:
+                    return await self._hedged(attempt)
+                return await attempt()
+            except Exception as e:
+                retry += 1
+                if not is_retryable(e) or retry >= self.max_attempts:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.backoff(retry)
+                if time.monotonic() + delay >= deadline:
+                    logger.warning(
+                        f"Not retrying LLM call, {delay:.2f}s wait would exceed the deadline: {e}"
+                    )
+                    raise
+                self.retries += 1
+                logger.warning(
+                    f"Retrying LLM call in {delay:.2f}s "
+                    f"(attempt {retry + 1}/{self.max_attempts}): {e}"
+                )
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        p95 = self.latency.percentile(0.95)
+        if p95 is None:
+            return await attempt()
+
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({primary}, timeout=max(p95, self.hedge_min_delay))
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedged = asyncio.ensure_future(attempt())
+        pending = {primary, hedged}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_latency": self.latency.percentile(0.95),
+        }
@@ -0,0 +1,103 @@
+"""Per-request stage timings, reported in logs, `Server-Timing` and histograms."""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from src.metrics import REQUEST_SECONDS, REQUESTS, STAGE_SECONDS
+from src.logger import sample_request_logs, setup_logging
+
+logger = setup_logging()
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "stage_timings", default=None
+)
+
+
+def start_timings() -> Dict[str, float]:
+    """Starts collecting stage timings for the current request and returns them."""
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float):
+    """Adds `seconds` to the current request's `name` stage and its histogram.
+
+    Stages hit several times in one request (retries, hedges) accumulate.
+    """
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()
+    )
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware that collects stage timings and RED metrics for each HTTP request.
+
+    Timings recorded before the response starts go out as a `Server-Timing` header;
+    requests that recorded any stage also get one log line with every stage in ms.
+    Request counts and latency are labelled with the route template, not the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sample_request_logs()
+        timings = start_timings()
+        started = time.perf_counter()
+        status = None
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing({**timings, "total": time.perf_counter() - started}),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            REQUESTS.labels(scope["method"], route, str(status or 500)).inc()
+            REQUEST_SECONDS.labels(scope["method"], route).observe(elapsed)
+            if timings:
+                stages = {
+                    f"{name}_ms": round(seconds * 1000, 2)
+                    for name, seconds in timings.items()
+                }
+                logger.info(
+                    f"Handled {scope['method']} {scope['path']}",
+                    status=status,
+                    total_ms=round(elapsed * 1000, 2),
+                    **stages,
+                )
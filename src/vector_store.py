@@ -1,49 +1,294 @@
+import asyncio
+import contextvars
 import logging
-from typing import List, Dict, Any, Tuple
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 import chromadb
 
+from src.embedding_backends import CHROMA_DEFAULT_SIGNATURE
+from src.embeddings import CachedEmbeddingFunction
+from src.numpy_index import NumpyCollection
+from src.timing import record_stage, stage
+
 logger = logging.getLogger(__name__)
 
+EMBEDDING_SIGNATURE_KEY = "embedding_signature"
+
+T = TypeVar("T")
+
+
+def normalize_attribute_name(name: str) -> str:
+    """Canonical form used for exact attribute matching (case and whitespace insensitive)."""
+    return " ".join(name.split()).lower()
+
 
 class VectorStore:
     def __init__(
         self,
         persist_directory: str = "./data/chroma_db",
         collection_name: str = "attributes",
+        max_workers: Optional[int] = None,
+        embedding_function: Optional[Any] = None,
+        backend: Optional[str] = None,
     ):
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        # "chroma" (SQLite + HNSW) or "numpy" (in-process brute force, for catalogs
+        # of up to tens of thousands of names).
+        self.backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")).lower()
+        if self.backend == "numpy":
+            self.client = None
+            self.collection = NumpyCollection(
+                os.path.join(persist_directory, f"{collection_name}.numpy")
+            )
+        elif self.backend == "chroma":
+            self.client = chromadb.PersistentClient(path=persist_directory)
+            self.collection = self.client.get_or_create_collection(name=collection_name)
+        else:
+            raise ValueError(f"Unknown vector store backend {self.backend!r}")
+
+        # Embeddings are computed here and passed to ChromaDB explicitly, so the
+        # embedding function can be swapped or wrapped without touching the collection.
+        # all-MiniLM-L6-v2 (ONNX) behind an LRU by default.
+        self.embedding_function = embedding_function or CachedEmbeddingFunction()
+
+        # Embedding + HNSW queries are CPU bound and blocking, so async callers are
+        # served from a dedicated bounded pool instead of the event loop thread.
+        self.max_workers = max_workers or int(
+            os.getenv("VECTOR_STORE_MAX_WORKERS", "4")
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="vector-search"
+        )
+        limit_callers = getattr(
+            self.embedding_function, "limit_microbatch_callers", None
+        )
+        if limit_callers:
+            limit_callers(self.max_workers)
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._peak_queue_depth = 0
+
+        # Normalized attribute name -> stored entry, so known attributes are answered
+        # without touching the embedding model.
+        self._exact_index: Dict[str, Dict[str, Any]] = {}
+        self._load_exact_index()
+
+        # Document count served to health checks and metrics without querying
+        # SQLite; refreshed after writes and periodically via `refresh_count`.
+        self._document_count = 0
+        self._count_refreshed_at = 0.0
+        self.refresh_count()
+
+        # Stored vectors are only comparable with queries embedded by the same
+        # backend; after a backend change the next sync re-embeds every document.
+        self.embedding_signature = getattr(self.embedding_function, "signature", None)
+        self.embeddings_stale = (
+            self.embedding_signature is not None
+            and self._document_count > 0
+            and self.stored_embedding_signature() != self.embedding_signature
+        )
+        if self.embeddings_stale:
+            logger.warning(
+                f"Collection was embedded with {self.stored_embedding_signature()!r}, "
+                f"not {self.embedding_signature!r}; it is re-embedded on the next sync"
+            )
 
-        # all-MiniLM-L6-v2 by default.
-        self.collection = self.client.get_or_create_collection(name=collection_name)
         logger.info(
-            f"Initialized VectorStore with collection '{collection_name}' at '{persist_directory}'"
+            f"Initialized {self.backend} VectorStore with collection '{collection_name}' at '{persist_directory}' "
+            f"({self.max_workers} search workers, {len(self._exact_index)} indexed names)"
         )
 
+    def _load_exact_index(self, page_size: int = 5000):
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas"], limit=page_size, offset=offset
+            )
+            if not page["ids"]:
+                break
+            self._index_entries(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+
+    def _index_entries(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]],
+    ):
+        for i, (doc_id, text) in enumerate(zip(ids, texts)):
+            meta = (metadatas[i] if metadatas else None) or {}
+            self._exact_index[normalize_attribute_name(text)] = {
+                "id": doc_id,
+                "attribute_name": text,
+                "prompt": meta.get("prompt", ""),
+                "system_role": meta.get("system_role", ""),
+            }
+
+    def get_content_hashes(self, page_size: int = 5000) -> Dict[str, Optional[str]]:
+        """Returns the stored `content_hash` metadata of every document, by ID."""
+        hashes = {}
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["metadatas"], limit=page_size, offset=offset
+            )
+            if not page["ids"]:
+                break
+            for doc_id, meta in zip(page["ids"], page["metadatas"]):
+                hashes[doc_id] = (meta or {}).get("content_hash")
+            offset += len(page["ids"])
+        return hashes
+
+    def delete(self, ids: List[str]):
+        """Removes documents from the collection and the exact-match index."""
+        if not ids:
+            return
+
+        self.collection.delete(ids=ids)
+        removed = set(ids)
+        for name in [
+            name for name, entry in self._exact_index.items() if entry["id"] in removed
+        ]:
+            del self._exact_index[name]
+        self._persist()
+        self.refresh_count()
+        logger.info(f"Deleted {len(ids)} documents from vector store")
+
+    def get_exact(self, attribute_name: str) -> Optional[Dict[str, Any]]:
+        """Looks up an attribute by normalized name without running a semantic search."""
+        return self._exact_index.get(normalize_attribute_name(attribute_name))
+
     def add_texts(
-        self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
     ):
-        """Adds texts to the vector store."""
+        """Adds texts to the vector store.
+
+        Texts are embedded in chunks of `batch_size` on up to `workers` threads while
+        previously embedded chunks are upserted, so ingestion is not one giant blocking
+        call and progress can be logged.
+        """
         if not texts:
             return
 
-        self.collection.upsert(documents=texts, metadatas=metadatas, ids=ids)
-        logger.info(f"Upserted {len(texts)} documents into vector store")
+        batch_size = batch_size or int(os.getenv("INDEX_BATCH_SIZE", "512"))
+        if self.client is not None:
+            batch_size = min(batch_size, self.client.get_max_batch_size())
+        workers = workers or int(os.getenv("INDEX_EMBED_WORKERS", "4"))
+        starts = range(0, len(texts), batch_size)
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="vector-index"
+        ) as pool:
+
+            def embed_chunk(start: int) -> Tuple[int, Future]:
+                chunk = texts[start : start + batch_size]
+                if start == 0:
+                    # Embedded here, so the model is loaded once before the workers
+                    # start instead of by each of the first chunks at the same time.
+                    embedded: Future = Future()
+                    embedded.set_result(self.embedding_function(chunk))
+                    return start, embedded
+                return start, pool.submit(self.embedding_function, chunk)
+
+            # Keep a bounded window of chunks embedding ahead of the upserts.
+            window = workers * 2
+            pending = deque(embed_chunk(start) for start in starts[:window])
+            next_start = window * batch_size
+
+            while pending:
+                start, embeddings = pending.popleft()
+                end = min(start + batch_size, len(texts))
+                self.collection.upsert(
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end],
+                    embeddings=embeddings.result(),
+                )
+                self._index_entries(
+                    ids[start:end], texts[start:end], metadatas[start:end]
+                )
+
+                if next_start < len(texts):
+                    pending.append(embed_chunk(next_start))
+                    next_start += batch_size
+
+                elapsed = time.perf_counter() - started_at
+                logger.info(
+                    f"Indexed {end}/{len(texts)} documents "
+                    f"({end / elapsed if elapsed else 0:.0f} docs/s)"
+                )
+
+        self._persist()
+        self.refresh_count()
+        logger.info(
+            f"Upserted {len(texts)} documents into vector store "
+            f"in {time.perf_counter() - started_at:.2f}s"
+        )
 
     def search(
         self, query: str, top_k: int = 5
     ) -> Tuple[List[Dict[str, Any]], List[float]]:
         """Searches for similar attributes."""
-        results = self.collection.query(query_texts=[query], n_results=top_k)
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(
+        self, queries: List[str], top_k: int = 5, batch_size: Optional[int] = None
+    ) -> List[Tuple[List[Dict[str, Any]], List[float]]]:
+        """Searches for several queries with one embedding pass.
+
+        Repeated queries are searched once, and distinct queries go to the collection
+        in chunks of `batch_size` (SEARCH_BATCH_SIZE), so hundreds of attributes cost
+        a few `collection.query` calls instead of one each.
+
+        Returns one (documents, distances) pair per query, in the same order.
+        """
+        if not queries:
+            return []
+
+        unique = list(dict.fromkeys(queries))
+        batch_size = batch_size or int(os.getenv("SEARCH_BATCH_SIZE", "256"))
+        if self.client is not None:
+            batch_size = min(batch_size, self.client.get_max_batch_size())
+
+        with stage("embed"):
+            embeddings = self.embedding_function.embed_query(unique)
+        parsed: Dict[str, Tuple[List[Dict[str, Any]], List[float]]] = {}
+        for start in range(0, len(unique), batch_size):
+            chunk = unique[start : start + batch_size]
+            with stage("search"):
+                results = self.collection.query(
+                    query_embeddings=embeddings[start : start + batch_size],
+                    n_results=top_k,
+                )
+            with stage("parse"):
+                for i, query in enumerate(chunk):
+                    parsed[query] = self._parse_results(results, i)
+        return [parsed[query] for query in queries]
 
-        if not results["documents"] or not results["documents"][0]:
+    @staticmethod
+    def _parse_results(
+        results: Dict[str, Any], i: int
+    ) -> Tuple[List[Dict[str, Any]], List[float]]:
+        if not results["documents"] or not results["documents"][i]:
             return [], []
 
-        documents = results["documents"][0]
+        documents = results["documents"][i]
         metadatas = (
-            results["metadatas"][0] if results["metadatas"] else [{}] * len(documents)
+            results["metadatas"][i] if results["metadatas"] else [{}] * len(documents)
         )
         distances = (
-            results["distances"][0] if results["distances"] else [0.0] * len(documents)
+            results["distances"][i] if results["distances"] else [0.0] * len(documents)
         )
 
         parsed_results = []
@@ -58,5 +303,122 @@ class VectorStore:
 
         return parsed_results, distances
 
+    async def asearch(
+        self, query: str, top_k: int = 5
+    ) -> Tuple[List[Dict[str, Any]], List[float]]:
+        """Runs `search` on the search executor without blocking the event loop."""
+        return await self._submit(self.search, query, top_k)
+
+    async def asearch_many(
+        self, queries: List[str], top_k: int = 5
+    ) -> List[Tuple[List[Dict[str, Any]], List[float]]]:
+        """Runs `search_many` on the search executor without blocking the event loop."""
+        return await self._submit(self.search_many, queries, top_k)
+
+    async def _submit(self, fn: Callable[..., T], *args) -> T:
+        with self._stats_lock:
+            self._queued += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queued)
+
+        # Run in the caller's context so stage timings land on its request.
+        future = self._executor.submit(
+            contextvars.copy_context().run, self._run, time.perf_counter(), fn, *args
+        )
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _run(self, submitted_at: float, fn: Callable[..., T], *args) -> T:
+        record_stage("search_queue", time.perf_counter() - submitted_at)
+        with self._stats_lock:
+            self._queued -= 1
+            self._in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def _on_done(self, future: Future):
+        # A caller cancelled before a worker picked the job up, so _run never ran.
+        if future.cancelled():
+            with self._stats_lock:
+                self._queued -= 1
+
+    def executor_stats(self) -> Dict[str, int]:
+        """Returns a snapshot of the search executor's concurrency and queue depth."""
+        with self._stats_lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "peak_queue_depth": self._peak_queue_depth,
+            }
+
+    def warmup(self):
+        """Loads the embedding model and the HNSW index with a throwaway query."""
+        started_at = time.perf_counter()
+        embeddings = self.embedding_function(["warmup"])
+        if self.count():
+            self.collection.query(query_embeddings=embeddings, n_results=1)
+        logger.info(
+            f"Warmed up vector store in {time.perf_counter() - started_at:.2f}s"
+        )
+
+    def embedding_stats(self) -> Optional[Dict[str, Any]]:
+        stats = getattr(self.embedding_function, "stats", None)
+        return stats() if stats else None
+
+    def stored_embedding_signature(self) -> str:
+        """Signature of the embedding backend the stored vectors were made with."""
+        # Collections written before signatures were recorded used ChromaDB's default.
+        metadata = self.collection.metadata or {}
+        return metadata.get(EMBEDDING_SIGNATURE_KEY, CHROMA_DEFAULT_SIGNATURE)
+
+    def mark_embeddings_current(self):
+        """Records that every stored vector comes from the current embedding backend."""
+        if self.embedding_signature is None:
+            return
+        if self.stored_embedding_signature() != self.embedding_signature:
+            self.collection.modify(
+                metadata={
+                    **(self.collection.metadata or {}),
+                    EMBEDDING_SIGNATURE_KEY: self.embedding_signature,
+                }
+            )
+            self._persist()
+        self.embeddings_stale = False
+
+    def _persist(self):
+        # ChromaDB writes through; the NumPy index is saved once per batch of writes.
+        flush = getattr(self.collection, "flush", None)
+        if flush:
+            flush()
+
+    @property
+    def model_loaded(self) -> Optional[bool]:
+        """Whether the embedding model has been loaded (None if the function can't tell)."""
+        return getattr(self.embedding_function, "model_loaded", None)
+
     def count(self) -> int:
-        return self.collection.count()
+        """Cached document count; does no I/O."""
+        return self._document_count
+
+    def refresh_count(self) -> int:
+        """Re-reads the document count from the collection."""
+        self._document_count = self.collection.count()
+        self._count_refreshed_at = time.monotonic()
+        return self._document_count
+
+    def count_age(self) -> float:
+        """Seconds since the cached document count was last read from the collection."""
+        return time.monotonic() - self._count_refreshed_at
+
+    def close(self):
+        """Stops the search executor, waiting for running queries to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._persist()
+        close = getattr(self.embedding_function, "close", None)
+        if close:
+            close()
@@ -1,3 +1,8 @@
+import asyncio
+import json
+
+import httpx
+import openai
 import pytest
 from httpx import AsyncClient, ASGITransport
 import os
@@ -10,7 +15,9 @@ if "AZURE_OPENAI_ENDPOINT" not in os.environ:
         "https://test-dummy-endpoint.openai.azure.com/"
     )
 
+from src import api
 from src.api import app
+from src.singleflight import SingleFlight
 
 
 @pytest.mark.asyncio
@@ -38,3 +45,322 @@ async def test_generate_prompt_missing_field():
     assert (
         response.status_code == 422
     )  # Unprocessable Entity due to Pydantic validation
+
+
+class FakeVectorStore:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.searches = 0
+
+    async def asearch(self, query, top_k=5):
+        self.searches += 1
+        return self.docs[:top_k], [0.1] * len(self.docs[:top_k])
+
+    async def asearch_many(self, queries, top_k=5):
+        self.searches += 1
+        results = []
+        for query in queries:
+            docs = sorted(self.docs, key=lambda d: d["attribute_name"] != query)
+            results.append((docs[:top_k], [0.1] * len(docs[:top_k])))
+        return results
+
+    def get_exact(self, attribute_name):
+        for doc in self.docs:
+            if doc["attribute_name"].lower() == attribute_name.strip().lower():
+                return doc
+        return None
+
+    model_loaded = True
+
+    def count(self):
+        return len(self.docs)
+
+    def count_age(self):
+        return 0.0
+
+    def executor_stats(self):
+        return {}
+
+    def embedding_stats(self):
+        return {"hits": 0, "misses": 0}
+
+
+class FakeGenerator:
+    cache = None
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate_prompt(self, attribute_name, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if attribute_name == "broken":
+            raise RuntimeError("LLM unavailable")
+        if attribute_name == "throttled":
+            response = httpx.Response(
+                429,
+                headers={"retry-after": "7"},
+                request=httpx.Request("POST", "https://test.openai.azure.com/"),
+            )
+            raise openai.RateLimitError("Error code: 429", response=response, body=None)
+        return {"prompt": f"Extract {attribute_name}", "system_role": "expert"}
+
+    async def stream_prompt(self, attribute_name, **kwargs):
+        self.calls += 1
+        for token in ['{"prompt": ', '"Extract', '"}']:
+            yield "token", token
+        yield "result", {"prompt": f"Extract {attribute_name}", "system_role": "expert"}
+
+    def cache_stats(self):
+        return None
+
+    def retry_stats(self):
+        return {}
+
+    def limiter_stats(self):
+        return {
+            "primary": {
+                "circuit": "closed",
+                "in_flight": 0,
+                "waiting": 0,
+                "concurrency_limit": 16,
+            }
+        }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced(monkeypatch):
+    fake_store, fake_generator = FakeVectorStore(), FakeGenerator()
+    monkeypatch.setattr(api, "vector_store", fake_store)
+    monkeypatch.setattr(api, "generator", fake_generator)
+    monkeypatch.setattr(api, "inflight_requests", SingleFlight())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        responses = await asyncio.gather(
+            *(
+                ac.post(
+                    "/generate-prompt",
+                    json={"attribute_name": "Strap Color", "has_fixed_values": i % 2},
+                )
+                for i in range(5)
+            )
+        )
+
+    assert all(r.status_code == 200 for r in responses)
+    assert fake_store.searches == 1
+    assert fake_generator.calls == 1
+    assert api.inflight_requests.stats()["coalesced"] == 4
+    # Formatting rules are still applied per request.
+    assert "allowed_values" in responses[1].json()[0]["prompt"]
+    assert "allowed_values" not in responses[0].json()[0]["prompt"]
+
+
+@pytest.mark.asyncio
+async def test_llm_throttling_is_returned_as_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(api, "vector_store", FakeVectorStore())
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+    monkeypatch.setattr(api, "inflight_requests", SingleFlight())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        throttled = await ac.post(
+            "/generate-prompt", json={"attribute_name": "throttled"}
+        )
+        broken = await ac.post("/generate-prompt", json={"attribute_name": "broken"})
+
+    assert throttled.status_code == 503
+    assert throttled.headers["retry-after"] == "7"
+    assert broken.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_per_item_results(monkeypatch):
+    fake_store = FakeVectorStore(
+        docs=[{"attribute_name": "Color", "prompt": "Stored", "system_role": "db"}]
+    )
+    fake_generator = FakeGenerator()
+    monkeypatch.setattr(api, "vector_store", fake_store)
+    monkeypatch.setattr(api, "generator", fake_generator)
+    monkeypatch.setattr(api, "inflight_requests", SingleFlight())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/generate-prompts",
+            json=[
+                {"attribute_name": "Material"},
+                {"attribute_name": "broken"},
+                {"attribute_name": "Color"},
+            ],
+        )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_index = {line["index"]: line for line in lines}
+
+    assert lines[0]["index"] == 2  # the exact match does not wait for the LLM items
+    assert by_index[2]["prompts"][0]["system_role"] == "db"
+    assert by_index[0]["prompts"][0]["prompt"].startswith("Extract Material")
+    assert by_index[1]["prompts"] is None
+    assert by_index[1]["error"] == "LLM unavailable"
+    assert fake_store.searches == 1
+    assert fake_generator.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_exact_match_skips_search(monkeypatch):
+    fake_store = FakeVectorStore(
+        docs=[{"attribute_name": "Color", "prompt": "Stored", "system_role": "db"}]
+    )
+    monkeypatch.setattr(api, "vector_store", fake_store)
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post("/generate-prompt", json={"attribute_name": " color"})
+
+    assert response.status_code == 200
+    assert response.json()[0]["prompt"].startswith("Stored")
+    assert fake_store.searches == 0
+
+
+@pytest.mark.asyncio
+async def test_exact_match_serves_materialized_body(monkeypatch):
+    entry = {"attribute_name": "Color", "prompt": "Stored", "system_role": "db"}
+    monkeypatch.setattr(api, "vector_store", FakeVectorStore(docs=[entry]))
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        fast = await ac.post(
+            "/generate-prompt", json={"attribute_name": "Color", "has_fixed_values": 1}
+        )
+        monkeypatch.setattr(api, "materialized_response", lambda request: None)
+        slow = await ac.post(
+            "/generate-prompt", json={"attribute_name": "Color", "has_fixed_values": 1}
+        )
+
+    assert fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.content == slow.content
+    assert fast.headers["server-timing"].startswith("render;dur=")
+    assert "total;dur=" in fast.headers["server-timing"]
+    assert entry["rendered"][True] is not None
+
+
+@pytest.mark.asyncio
+async def test_fast_json_response_matches_default_body(monkeypatch):
+    class UnicodeGenerator(FakeGenerator):
+        async def generate_prompt(self, attribute_name, **kwargs):
+            return {"prompt": 'Größe "EU"\tcm', "system_role": "expert ✓"}
+
+    monkeypatch.setattr(api, "vector_store", FakeVectorStore())
+    monkeypatch.setattr(api, "generator", UnicodeGenerator())
+    monkeypatch.setattr(api, "inflight_requests", SingleFlight())
+
+    payload = {"attribute_name": "Größe", "has_fixed_values": True}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        default = await ac.post("/generate-prompt", json=payload)
+        monkeypatch.setenv("FAST_JSON_RESPONSES", "true")
+        fast = await ac.post("/generate-prompt", json=payload)
+
+    assert fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.content == default.content
+
+
+@pytest.mark.asyncio
+async def test_metrics_expose_red_and_bypass_counters(monkeypatch):
+    fake_store = FakeVectorStore(
+        docs=[{"attribute_name": "Color", "prompt": "Stored", "system_role": "db"}]
+    )
+    monkeypatch.setattr(api, "vector_store", fake_store)
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        await ac.post("/generate-prompt", json={"attribute_name": "Color"})
+        response = await ac.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.text
+    assert (
+        'http_requests_total{method="POST",route="/generate-prompt",status="200"}'
+        in body
+    )
+    assert 'http_request_duration_seconds_bucket{le="0.0005",method="POST"' in body
+    assert 'prompt_resolutions_total{source="exact_match"}' in body
+    assert "vector_store_documents 1.0" in body
+    assert 'llm_in_flight_requests{deployment="primary"} 0.0' in body
+
+
+@pytest.mark.asyncio
+async def test_stream_forwards_tokens_then_result(monkeypatch):
+    monkeypatch.setattr(api, "vector_store", FakeVectorStore())
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/generate-prompt/stream",
+            json={"attribute_name": "Material", "has_fixed_values": True},
+        )
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["event"] for e in events] == ["token", "token", "token", "result"]
+    result = events[-1]["data"]
+    assert [p["user_input"] for p in result] == ["all_images", "None"]
+    assert "allowed_values" in result[0]["prompt"]
+
+
+@pytest.mark.asyncio
+async def test_health_reports_state_without_querying_the_store(monkeypatch):
+    fake_store = FakeVectorStore(docs=[{"attribute_name": "Color"}])
+    fake_store.asearch = fake_store.asearch_many = None  # any I/O would fail
+    monkeypatch.setattr(api, "vector_store", fake_store)
+    monkeypatch.setattr(api, "generator", FakeGenerator())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        data = (await ac.get("/health")).json()
+
+    assert data["ready"] is True
+    assert data["model_loaded"] is True
+    assert data["db_count"] == 1
+    assert data["llm_circuits"] == {"primary": "closed"}
+
+
+@pytest.mark.asyncio
+async def test_readiness_is_separate_from_liveness(monkeypatch):
+    monkeypatch.setattr(api, "vector_store", None)
+    monkeypatch.setattr(api, "startup_stage", "syncing_data")
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        live = await ac.get("/health/live")
+        not_ready = await ac.get("/health/ready")
+        rejected = await ac.post("/generate-prompt", json={"attribute_name": "Color"})
+
+        monkeypatch.setattr(api, "vector_store", FakeVectorStore())
+        ready = await ac.get("/health/ready")
+
+    assert live.status_code == 200
+    assert not_ready.status_code == 503
+    assert not_ready.json()["status"] == "syncing_data"
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "5"
+    assert ready.status_code == 200
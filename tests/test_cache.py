@@ -0,0 +1,100 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from src.cache import ResponseCache
+
+
+def test_disk_tier_survives_restart_and_evicts(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = ResponseCache(path=path, max_memory_entries=1, max_disk_entries=2)
+    keys = [ResponseCache.make_key("gpt-4o", "system", f"user {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.set(key, {"prompt": f"p{i}", "system_role": "r"})
+    cache.close()
+
+    reopened = ResponseCache(path=path, max_memory_entries=1, max_disk_entries=2)
+    assert reopened.get(keys[0]) is None  # evicted by the disk size bound
+    assert reopened.get(keys[2]) == {"prompt": "p2", "system_role": "r"}
+    assert reopened.get(keys[2]) == {"prompt": "p2", "system_role": "r"}
+
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    reopened.close()
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(ttl_seconds=-1)
+    key = ResponseCache.make_key("gpt-4o", "system", "user")
+    cache.set(key, {"prompt": "p", "system_role": "r"})
+
+    assert cache.get(key) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_disk_tier_is_trimmed_in_batches(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "llm_cache.sqlite3"), max_disk_entries=10)
+    for i in range(11):
+        cache.set(f"key {i}", {"prompt": f"p{i}"})
+
+    # One over the bound evicts a tenth of it plus the overflow in one statement.
+    assert cache.stats()["disk_entries"] == 9
+    assert cache.stats()["evictions"] == 2
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_async_disk_access_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = ResponseCache(path=path, max_memory_entries=1)
+    get_disk = cache._get_disk
+
+    def slow_get_disk(key, now):
+        time.sleep(0.1)
+        return get_disk(key, now)
+
+    cache._get_disk = slow_get_disk
+    cache.aset("a", {"prompt": "a"})
+    cache.aset("b", {"prompt": "b"})  # pushes "a" out of the memory tier
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    assert await cache.aget("a") == {"prompt": "a"}
+    task.cancel()
+
+    assert ticks >= 5
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("b") == {"prompt": "b"}
+    reopened.close()
+
+
+def test_background_write_errors_are_logged(tmp_path, monkeypatch):
+    cache = ResponseCache(path=str(tmp_path / "llm_cache.sqlite3"))
+    errors = []
+    monkeypatch.setattr("src.cache.logger.error", errors.append)
+
+    def failing_set_disk(key, serialized, now):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    cache._set_disk = failing_set_disk
+    cache.aset("a", {"prompt": "a"})
+    cache.close()  # drains the background write
+
+    assert errors == [
+        "Failed to write LLM response to the disk cache: database or disk is full"
+    ]
+    assert cache.get("a") == {"prompt": "a"}  # still served from memory
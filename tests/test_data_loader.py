@@ -0,0 +1,146 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.data_loader import load_and_index_data, parse_arguments
+from src.embeddings import CachedEmbeddingFunction
+from src.vector_store import VectorStore
+from tests.conftest import LetterCountEmbedding
+
+
+def write_export(directory, rows):
+    """Writes the three CSV exports for a list of (attribute_name, arguments) rows."""
+    ids = range(len(rows))
+    pd.DataFrame(
+        {"attribute_id": ids, "attribute_name": [name for name, _ in rows]}
+    ).to_csv(directory / "attrs.csv", index=False)
+    pd.DataFrame({"llm_mapper_id": ids, "attribute_id": ids}).to_csv(
+        directory / "mapper.csv", index=False
+    )
+    pd.DataFrame(
+        {"llm_mapper_id": ids, "arguments": [args for _, args in rows]}
+    ).to_csv(directory / "prompts.csv", index=False)
+
+
+def sync(directory, store, **kwargs):
+    load_and_index_data(
+        attributes_csv=str(directory / "attrs.csv"),
+        mapper_csv=str(directory / "mapper.csv"),
+        prompt_csv=str(directory / "prompts.csv"),
+        vector_store=store,
+        **kwargs,
+    )
+
+
+def args(prompt, system_role="role"):
+    return json.dumps({"prompt": prompt, "system_role": system_role})
+
+
+@pytest.fixture
+def model():
+    return LetterCountEmbedding()
+
+
+@pytest.fixture
+def store(tmp_path, model):
+    vs = VectorStore(
+        persist_directory=str(tmp_path / "chroma_db"),
+        embedding_function=CachedEmbeddingFunction(model),
+    )
+    yield vs
+    vs.close()
+
+
+def test_parse_arguments_handles_invalid_and_missing_payloads():
+    arguments = pd.Series(
+        [
+            args("p1", "r1"),
+            "not json",
+            None,
+            args("p1", "r1"),
+            json.dumps(["not", "a", "dict"]),
+        ]
+    )
+
+    parsed = parse_arguments(arguments)
+
+    assert parsed["prompt"].tolist() == ["p1", "", "", "p1", ""]
+    assert parsed["system_role"].tolist() == ["r1", "", "", "r1", ""]
+
+
+def test_parse_arguments_decodes_each_payload_on_its_own():
+    # Each payload is invalid alone, but concatenated they form a valid list of the
+    # right length.
+    arguments = pd.Series(
+        ['[{"prompt":"p1"}', '{"prompt":"p2"}]', '{"prompt":"c"}, {"prompt":"d"}']
+    )
+
+    parsed = parse_arguments(arguments)
+
+    assert parsed["prompt"].tolist() == ["", "", ""]
+
+
+def test_load_and_index_data_upserts_in_chunks(tmp_path, store, model):
+    rows = [(f"Attribute {i}", args(f"prompt {i}")) for i in range(25)]
+    rows += [("  Padded  ", args("prompt 25")), (None, "{broken")]
+    write_export(tmp_path, rows)
+
+    sync(tmp_path, store, batch_size=10, workers=2)
+
+    assert store.count() == 26
+    assert model.calls == 3
+    padded = store.get_exact("padded")
+    assert padded["attribute_name"] == "Padded"
+    assert padded["prompt"] == "prompt 25"
+    metadata = store.collection.get(ids=["attr_padded"])["metadatas"][0]
+    assert metadata["original_id"] == "25"
+    assert metadata["system_role"] == "role"
+
+
+def test_resync_only_touches_changed_and_removed_rows(tmp_path, store, model):
+    write_export(
+        tmp_path,
+        [("Color", args("color v1")), ("Size", args("size v1")), ("Weight", args("w"))],
+    )
+    sync(tmp_path, store)
+    embedded_after_first_sync = model.texts
+
+    write_export(
+        tmp_path,
+        [("Color", args("color v2")), ("Size", args("size v1")), ("Shape", args("s"))],
+    )
+    sync(tmp_path, store)
+
+    assert model.texts - embedded_after_first_sync == 2  # Color changed, Shape added
+    assert store.count() == 3
+    assert store.get_exact("weight") is None
+    assert store.get_exact("color")["prompt"] == "color v2"
+    assert store.get_exact("size")["prompt"] == "size v1"
+
+
+def test_backend_change_re_embeds_the_whole_collection(tmp_path, model):
+    write_export(tmp_path, [("Color", args("c")), ("Size", args("s"))])
+    path = str(tmp_path / "chroma_db")
+
+    model.signature = "letters:fp32"
+    first = VectorStore(persist_directory=path, embedding_function=model)
+    sync(tmp_path, first)
+    first.close()
+    assert first.stored_embedding_signature() == "letters:fp32"
+
+    reopened = VectorStore(persist_directory=path, embedding_function=model)
+    assert not reopened.embeddings_stale
+    sync(tmp_path, reopened)
+    assert model.texts == 2  # unchanged export, same backend: nothing re-embedded
+    reopened.close()
+
+    model.signature = "letters:int8"
+    changed = VectorStore(persist_directory=path, embedding_function=model)
+    assert changed.embeddings_stale
+    sync(tmp_path, changed)
+
+    assert model.texts == 4
+    assert not changed.embeddings_stale
+    assert changed.stored_embedding_signature() == "letters:int8"
+    changed.close()
@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from src.embedding_backends import (
+    CHROMA_DEFAULT_SIGNATURE,
+    ChromaDefaultEmbedding,
+    OnnxEmbedding,
+    SentenceTransformerEmbedding,
+    embedding_backend,
+    embedding_backend_from_env,
+)
+
+
+class FakeSession:
+    """Returns each token's id as its hidden state, so pooling is easy to check."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def run(self, output_names, feeds):
+        self.shapes.append(feeds["input_ids"].shape)
+        ids = feeds["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def onnx_embedding(**kwargs):
+    vocab = {"[PAD]": 0, "[UNK]": 1, "strap": 2, "color": 3, "heel": 4, "height": 5}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    embedding = OnnxEmbedding(**kwargs)
+    tokenizer.enable_truncation(max_length=embedding.max_seq_length)
+    tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    # Bypass the model download: cached_property values live in the instance dict.
+    embedding.__dict__["tokenizer"] = tokenizer
+    embedding.__dict__["session"] = FakeSession()
+    return embedding
+
+
+def test_onnx_embedding_pads_per_batch_and_pools_real_tokens():
+    embedding = onnx_embedding(batch_size=2, max_seq_length=3)
+
+    vectors = embedding(["strap color", "heel", "heel height strap color"])
+
+    # Padded to the longest text of each batch (truncated at 3), not to 256.
+    assert embedding.session.shapes == [(2, 2), (1, 3)]
+    # "heel" alone: padding is excluded from the mean.
+    expected = np.array([4.0, 1.0]) / np.linalg.norm([4.0, 1.0])
+    np.testing.assert_allclose(vectors[1], expected, rtol=1e-6)
+    assert all(v.dtype == np.float32 for v in vectors)
+
+
+def test_model_is_loaded_once_under_concurrent_first_calls(monkeypatch):
+    downloads = []
+
+    class SlowChromaModel:
+        MODEL_NAME = "all-MiniLM-L6-v2"
+        DOWNLOAD_PATH = "/models"
+        EXTRACTED_FOLDER_NAME = "onnx"
+
+        def _download_model_if_not_exists(self):
+            downloads.append(1)
+            time.sleep(0.05)
+
+    monkeypatch.setattr("src.embedding_backends.ONNXMiniLM_L6_V2", SlowChromaModel)
+    embedding = OnnxEmbedding()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        dirs = list(pool.map(lambda _: embedding._model_dir, range(4)))
+
+    assert downloads == [1]
+    assert dirs == ["/models/onnx"] * 4
+
+
+def test_chroma_default_backend_reuses_one_model(monkeypatch):
+    instances = []
+
+    class FakeChromaModel:
+        MODEL_NAME = "all-MiniLM-L6-v2"
+        tokenizer = model = None
+
+        def __init__(self):
+            instances.append(self)
+
+        def _download_model_if_not_exists(self):
+            time.sleep(0.02)
+
+        def __call__(self, input):
+            return [np.ones(3, dtype=np.float32) for _ in input]
+
+    monkeypatch.setattr("src.embedding_backends.ONNXMiniLM_L6_V2", FakeChromaModel)
+    embedding = embedding_backend(backend="chroma")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(embedding, [["color"], ["size"], ["fit"], ["heel"]]))
+    embedding(["strap"])
+
+    assert isinstance(embedding, ChromaDefaultEmbedding)
+    assert embedding.signature == CHROMA_DEFAULT_SIGNATURE
+    assert len(instances) == 1
+
+
+def test_backend_is_built_from_env(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "sentence-transformers")
+    monkeypatch.setenv("EMBEDDING_THREADS", "2")
+    monkeypatch.setenv("EMBEDDING_MAX_SEQ_LENGTH", "32")
+    monkeypatch.setenv("EMBEDDING_QUANTIZE", "true")
+
+    embedding = embedding_backend_from_env()
+
+    assert isinstance(embedding, SentenceTransformerEmbedding)
+    assert (embedding.threads, embedding.max_seq_length) == (2, 32)
+    assert embedding.signature.endswith(":int8")
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "tfidf")
+    with pytest.raises(ValueError):
+        embedding_backend_from_env()
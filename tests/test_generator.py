@@ -0,0 +1,352 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import openai
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-dummy-key")
+os.environ.setdefault(
+    "AZURE_OPENAI_ENDPOINT", "https://test-dummy-endpoint.openai.azure.com/"
+)
+
+from prometheus_client import REGISTRY
+
+from src.cache import ResponseCache
+from src.generator import PromptGenerator
+from src.http_client import ConnectionStats
+from src.llm_pool import CircuitBreaker, Deployment, DeploymentPool
+from src.rate_limiter import LimiterTimeout
+
+
+def completion(content: dict) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+class FakeAzure:
+    """httpx transport handler standing in for the Azure OpenAI chat completions API."""
+
+    def __init__(self, failures=()):
+        self.calls = 0
+        self.failures = list(failures)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.failures:
+            return self.failures.pop(0)
+        return httpx.Response(
+            200, json=completion({"prompt": "Extract it", "system_role": "expert"})
+        )
+
+
+@pytest.mark.asyncio
+async def test_generator_uses_shared_client_and_cache():
+    azure = FakeAzure()
+    stats = ConnectionStats()
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(azure),
+        event_hooks={"request": [stats.on_request]},
+    )
+    generator = PromptGenerator(cache=ResponseCache(), http_client=http_client)
+    tokens = {
+        "deployment": generator.pool.deployments[0].name,
+        "type": "completion",
+    }
+    before = {
+        "tokens": REGISTRY.get_sample_value("llm_tokens_total", tokens) or 0,
+        "llm_cache": REGISTRY.get_sample_value(
+            "prompt_resolutions_total", {"source": "llm_cache"}
+        )
+        or 0,
+    }
+
+    for _ in range(2):
+        result = await generator.generate_prompt(
+            attribute_name="Color", description="", examples=[]
+        )
+
+    assert result == {"prompt": "Extract it", "system_role": "expert"}
+    assert azure.calls == 1
+    assert stats.stats()["requests"] == 1
+    assert REGISTRY.get_sample_value("llm_tokens_total", tokens) - before["tokens"] == 5
+    assert (
+        REGISTRY.get_sample_value("prompt_resolutions_total", {"source": "llm_cache"})
+        - before["llm_cache"]
+        == 1
+    )
+
+    await generator.aclose()
+    assert not http_client.is_closed  # owned by the caller
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_generator_retries_throttled_calls_and_backs_off():
+    azure = FakeAzure(
+        failures=[httpx.Response(429, headers={"retry-after-ms": "10"}, json={})]
+    )
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(azure))
+    generator = PromptGenerator(http_client=http_client)
+    limiter = generator.pool.deployments[0].limiter
+    limit_before = limiter.stats()["concurrency_limit"]
+
+    result = await generator.generate_prompt(
+        attribute_name="Color", description="", examples=[]
+    )
+
+    assert result["prompt"] == "Extract it"
+    assert azure.calls == 2
+    assert generator.retry_stats()["retries"] == 1
+    assert limiter.stats()["throttled"] == 1
+    assert limiter.stats()["concurrency_limit"] < limit_before
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_over_and_opens_breaker_on_unhealthy_endpoint():
+    calls = {"eastus": 0, "westus": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        region = request.url.host.split(".")[0]
+        calls[region] += 1
+        if region == "eastus":
+            return httpx.Response(503, json={})
+        return httpx.Response(
+            200, json=completion({"prompt": "From west", "system_role": "r"})
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    deployments = [
+        Deployment(
+            endpoint=f"https://{region}.openai.azure.com/",
+            deployment="gpt-4o",
+            api_key="key",
+            api_version="2024-02-15-preview",
+            http_client=http_client,
+            name=region,
+            # eastus is preferred until its breaker opens.
+            weight=10 if region == "eastus" else 1,
+            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        for region in ("eastus", "westus")
+    ]
+    generator = PromptGenerator(
+        http_client=http_client, pool=DeploymentPool(deployments)
+    )
+
+    for i in range(3):
+        result = await generator.generate_prompt(
+            attribute_name=f"Attribute {i}", description="", examples=[]
+        )
+        assert result["prompt"] == "From west"
+
+    assert calls == {"eastus": 2, "westus": 3}
+    assert generator.limiter_stats()["eastus"]["circuit"] == "open"
+    assert generator.limiter_stats()["westus"]["circuit"] == "closed"
+    assert generator.retry_stats()["retries"] == 0
+    await http_client.aclose()
+
+
+def half_open_generator(handler):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.opened_at = time.monotonic() - 61  # reset timeout elapsed: half-open
+    deployment = Deployment(
+        endpoint="https://eastus.openai.azure.com/",
+        deployment="gpt-4o",
+        api_key="key",
+        api_version="2024-02-15-preview",
+        http_client=http_client,
+        breaker=breaker,
+    )
+    generator = PromptGenerator(
+        http_client=http_client, pool=DeploymentPool([deployment])
+    )
+    return generator, deployment, http_client
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_is_released_after_a_caller_error():
+    responses = [httpx.Response(400, json={}), None]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return responses.pop(0) or httpx.Response(
+            200, json=completion({"prompt": "Recovered", "system_role": "r"})
+        )
+
+    generator, deployment, http_client = half_open_generator(handler)
+
+    with pytest.raises(openai.BadRequestError):
+        await generator.generate_prompt(attribute_name="A", description="", examples=[])
+    assert deployment.breaker.available()
+
+    result = await generator.generate_prompt(
+        attribute_name="B", description="", examples=[]
+    )
+    assert result["prompt"] == "Recovered"
+    assert deployment.breaker.state == "closed"
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_is_released_when_no_capacity(monkeypatch):
+    generator, deployment, http_client = half_open_generator(FakeAzure())
+
+    async def no_capacity(estimated_tokens, deadline):
+        raise LimiterTimeout("no LLM capacity")
+
+    monkeypatch.setattr(deployment.limiter, "acquire", no_capacity)
+    with pytest.raises(LimiterTimeout):
+        await generator.generate_prompt(attribute_name="A", description="", examples=[])
+
+    assert deployment.breaker.state == "half_open"
+    assert deployment.breaker.available()
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_is_released_when_cancelled():
+    started = asyncio.Event()
+
+    async def hanging(request: httpx.Request) -> httpx.Response:
+        started.set()
+        await asyncio.sleep(60)
+
+    generator, deployment, http_client = half_open_generator(hanging)
+
+    task = asyncio.create_task(
+        generator.generate_prompt(attribute_name="A", description="", examples=[])
+    )
+    await started.wait()
+    assert not deployment.breaker.available()  # the trial is in flight
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert deployment.breaker.available()
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_transient_error_is_retried_when_the_other_breaker_is_open():
+    calls = {"eastus": 0, "westus": 0}
+    failures = [httpx.Response(503, json={})]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls[request.url.host.split(".")[0]] += 1
+        if failures:
+            return failures.pop(0)
+        return httpx.Response(
+            200, json=completion({"prompt": "After retry", "system_role": "r"})
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    deployments = [
+        Deployment(
+            endpoint=f"https://{region}.openai.azure.com/",
+            deployment="gpt-4o",
+            api_key="key",
+            api_version="2024-02-15-preview",
+            http_client=http_client,
+            name=region,
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60),
+        )
+        for region in ("eastus", "westus")
+    ]
+    deployments[1].breaker.opened_at = time.monotonic()  # westus is open
+    generator = PromptGenerator(
+        http_client=http_client, pool=DeploymentPool(deployments)
+    )
+    generator.retry_policy.backoff = lambda retry: 0.01
+
+    result = await generator.generate_prompt(
+        attribute_name="Color", description="", examples=[]
+    )
+
+    assert result["prompt"] == "After retry"
+    assert calls == {"eastus": 2, "westus": 0}
+    assert generator.retry_stats()["retries"] == 1
+    await http_client.aclose()
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    """SSE completion chunks, optionally failing with a read error after them."""
+
+    def __init__(self, tokens, fail=False):
+        self.tokens = tokens
+        self.fail = fail
+        self.closed = False
+
+    async def __aiter__(self):
+        for token in self.tokens:
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4o",
+                "choices": [{"index": 0, "delta": {"content": token}}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        if self.fail:
+            raise httpx.ReadError("connection reset")
+        yield b"data: [DONE]\n\n"
+
+    async def aclose(self):
+        self.closed = True
+
+
+def streaming_generator(stream):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, stream=stream
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return PromptGenerator(http_client=http_client), http_client
+
+
+@pytest.mark.asyncio
+async def test_stream_is_closed_when_the_client_goes_away():
+    stream = ChunkStream(['{"prompt": ', '"Extract"', ', "system_role": "r"}'])
+    generator, http_client = streaming_generator(stream)
+
+    events = generator.stream_prompt(
+        attribute_name="Color", description="", examples=[]
+    )
+    assert await events.__anext__() == ("token", '{"prompt": ')
+    await events.aclose()
+
+    assert stream.closed
+    await http_client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_are_recorded_on_the_breaker():
+    stream = ChunkStream(['{"prompt": '], fail=True)
+    generator, http_client = streaming_generator(stream)
+    breaker = generator.pool.deployments[0].breaker
+
+    with pytest.raises(openai.APIConnectionError):
+        async for _ in generator.stream_prompt(
+            attribute_name="Color", description="", examples=[]
+        ):
+            pass
+
+    assert breaker.failures == 1
+    assert stream.closed
+    await http_client.aclose()
@@ -0,0 +1,79 @@
+import io
+import json
+import logging
+
+import pytest
+import structlog
+
+from src import logger as logger_module
+from src.logger import configure_logging, sample_request_logs
+
+
+@pytest.fixture
+def output():
+    stream = io.StringIO()
+    yield stream
+    configure_logging()
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def log_twice():
+    log = structlog.get_logger("test")
+    for i in range(2):
+        log.info("hello", i=i)
+
+
+def test_cached_callsite_matches_stack_inspection(output):
+    configure_logging(callsite="full", stream=output)
+    log_twice()
+    configure_logging(callsite="cached", renderer="orjson", stream=output)
+    log_twice()
+
+    full, cached = lines(output)[:2], lines(output)[2:]
+    for a, b in zip(full, cached):
+        assert {k: a[k] for k in ("filename", "module", "lineno", "event", "i")} == {
+            k: b[k] for k in ("filename", "module", "lineno", "event", "i")
+        }
+    assert full[0]["module"] == "test_logger"
+
+
+def test_queue_handler_writes_off_the_caller_thread(output):
+    configure_logging(callsite="off", use_queue=True, stream=output)
+    logging.getLogger("foreign").warning("from %s", "stdlib")
+    log_twice()
+    logger_module.flush_logging()
+
+    events = [line["event"] for line in lines(output)]
+    assert events == ["from stdlib", "hello", "hello"]
+    assert "lineno" not in lines(output)[1]
+
+
+def test_unsampled_requests_drop_info_but_keep_warnings(output, monkeypatch):
+    configure_logging(stream=output)
+    monkeypatch.setenv("LOG_INFO_SAMPLE_RATE", "0")
+    sample_request_logs()
+
+    log = structlog.get_logger("test")
+    log.info("dropped")
+    log.warning("kept")
+    logger_module._request_sampled.set(None)
+
+    assert [line["event"] for line in lines(output)] == ["kept"]
+
+
+def test_only_callsite_off_changes_stdlib_globals(output):
+    srcfile = logging._srcfile
+    configure_logging(callsite="cached", stream=output)
+    assert logging.logThreads and logging.logProcesses
+    assert logging._srcfile == srcfile
+
+    configure_logging(callsite="off", stream=output)
+    assert not logging.logThreads and not logging.logProcesses
+    assert logging._srcfile is None
+
+    configure_logging(stream=output)
+    assert logging.logThreads and logging.logProcesses
+    assert logging._srcfile == srcfile
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.embeddings import CachedEmbeddingFunction
+from src.microbatch import MicroBatcher
+from src.vector_store import VectorStore
+from tests.conftest import LetterCountEmbedding
+
+
+def test_concurrent_calls_share_one_inference():
+    model = LetterCountEmbedding()
+    batcher = MicroBatcher(model, max_wait_ms=200, max_items=4)
+    texts = [["color"], ["size"], ["color"], ["material", "fit"]]
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        results = list(pool.map(batcher, texts))
+
+    assert model.calls == 1  # max_items reached before the wait expired
+    assert model.texts == 4  # "color" embedded once
+    assert [len(r) for r in results] == [1, 1, 1, 2]
+    assert (results[0][0] == results[2][0]).all()
+    assert (results[0][0] == model(["color"])[0]).all()
+    assert batcher.stats()["largest_batch"] == 4
+
+
+def test_lone_caller_waits_at_most_max_wait():
+    model = LetterCountEmbedding()
+    batcher = MicroBatcher(model, max_wait_ms=1, max_items=32)
+
+    assert len(batcher(["color"])) == 1
+    assert len(batcher(["size"])) == 1
+    assert batcher.stats()["batches"] == 2
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    barrier = threading.Barrier(2)
+
+    def failing(input):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(failing, max_wait_ms=200, max_items=2)
+
+    def call(text):
+        barrier.wait()
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            batcher([text])
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(call, ["color", "size"]))
+
+
+def test_cache_misses_are_micro_batched():
+    model = LetterCountEmbedding()
+    embedding = CachedEmbeddingFunction(
+        model, microbatch_wait_ms=200, microbatch_max_items=3
+    )
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(embedding.embed_query, [["Color"], ["Size"], ["Fit"]]))
+    embedding.embed_query(["color"])
+
+    assert model.calls == 1
+    assert embedding.stats()["microbatch"]["batches"] == 1
+    assert embedding.stats()["hits"] == 1
+    assert embedding.model_loaded
+
+
+def test_batch_is_released_once_every_caller_has_joined(tmp_path):
+    model = LetterCountEmbedding()
+    batcher = MicroBatcher(model, max_wait_ms=5000, max_items=32, max_callers=3)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(batcher, [["color"], ["size"], ["fit"]]))
+
+    assert time.perf_counter() - started < 1.0  # not the 5 s wait
+    assert model.calls == 1
+
+    store = VectorStore(
+        persist_directory=str(tmp_path / "chroma_db"),
+        max_workers=2,
+        embedding_function=CachedEmbeddingFunction(
+            LetterCountEmbedding(), microbatch_wait_ms=5
+        ),
+    )
+    assert store.embedding_stats()["microbatch"]["max_callers"] == 2
+    store.close()
@@ -0,0 +1,128 @@
+import chromadb
+import numpy as np
+
+from src.embeddings import CachedEmbeddingFunction
+from src.numpy_index import NumpyCollection
+from src.vector_store import VectorStore
+from tests.conftest import LetterCountEmbedding
+
+
+def random_vectors(count: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_query_matches_chroma_ranking(tmp_path):
+    vectors = random_vectors(200)
+    ids = [f"id_{i}" for i in range(len(vectors))]
+    documents = [f"doc {i}" for i in range(len(vectors))]
+    metadatas = [{"prompt": f"prompt {i}"} for i in range(len(vectors))]
+    # Chroma stores vectors as given; normalize so both spaces agree.
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    chroma = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection(
+        "reference"
+    )
+    chroma.upsert(
+        ids=ids,
+        embeddings=normalized.tolist(),
+        documents=documents,
+        metadatas=metadatas,
+    )
+    index = NumpyCollection()
+    index.upsert(ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas)
+
+    queries = random_vectors(5, seed=1)
+    expected = chroma.query(
+        query_embeddings=(
+            queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        ).tolist(),
+        n_results=5,
+    )
+    actual = index.query(query_embeddings=queries, n_results=5)
+
+    assert actual["ids"] == expected["ids"]
+    assert actual["documents"] == expected["documents"]
+    assert actual["metadatas"] == expected["metadatas"]
+    np.testing.assert_allclose(actual["distances"], expected["distances"], atol=1e-4)
+
+
+def test_upsert_delete_and_reload(tmp_path):
+    path = str(tmp_path / "index")
+    index = NumpyCollection(path)
+    index.upsert(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        documents=["A", "B", "C"],
+        metadatas=[{"prompt": "a"}, {"prompt": "b"}, {"prompt": "c"}],
+    )
+    index.upsert(ids=["b"], embeddings=[[-1.0, 0.0]], documents=["B2"], metadatas=[{}])
+    index.delete(["a"])
+    index.modify(metadata={"embedding_signature": "letters:fp32"})
+    index.flush()
+
+    reloaded = NumpyCollection(path)
+    assert reloaded.count() == 2
+    assert reloaded.metadata == {"embedding_signature": "letters:fp32"}
+    assert reloaded.get()["documents"] == ["B2", "C"]
+    result = reloaded.query(query_embeddings=[[-1.0, 0.0]], n_results=1)
+    assert result["ids"] == [["b"]]
+    assert result["distances"][0][0] == 0.0
+
+    # The first write copies the memory-mapped matrix instead of modifying the file.
+    reloaded.upsert(ids=["d"], embeddings=[[0.0, -1.0]], documents=["D"])
+    assert reloaded.count() == 3
+    assert NumpyCollection(path).count() == 2
+
+
+def test_vector_store_numpy_backend(tmp_path):
+    path = str(tmp_path / "db")
+    store = VectorStore(
+        persist_directory=path,
+        embedding_function=CachedEmbeddingFunction(LetterCountEmbedding()),
+        backend="numpy",
+    )
+    store.add_texts(
+        ids=["color", "size", "material"],
+        texts=["Color", "Size", "Material"],
+        metadatas=[{"prompt": f"prompt {i}"} for i in range(3)],
+    )
+    docs, distances = store.search("Colour", top_k=2)
+    assert docs[0]["attribute_name"] == "Color"
+    assert len(distances) == 2
+    assert store.count() == 3
+    store.close()
+
+    reopened = VectorStore(persist_directory=path, backend="numpy")
+    assert reopened.count() == 3
+    assert reopened.get_exact("size")["prompt"] == "prompt 1"
+    reopened.close()
+
+
+def test_upsert_does_not_change_vectors_seen_by_running_queries():
+    index = NumpyCollection()
+    index.upsert(
+        ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["A", "B"]
+    )
+    snapshot = index._vectors[: index.count()]
+
+    index.upsert(
+        ids=["a", "c"], embeddings=[[0.6, 0.8], [-1.0, 0.0]], documents=["A2", "C"]
+    )
+
+    np.testing.assert_array_equal(snapshot, [[1.0, 0.0], [0.0, 1.0]])
+    assert index.query(query_embeddings=[[0.0, 1.0]], n_results=2)["documents"] == [
+        ["B", "A2"]
+    ]
+
+
+def test_mismatched_files_are_discarded(tmp_path):
+    path = str(tmp_path / "index")
+    index = NumpyCollection(path)
+    index.upsert(
+        ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["A", "B"]
+    )
+    index.flush()
+    # A crash after the matrix was replaced but before entries.json was.
+    np.save(tmp_path / "index" / "vectors.npy", np.eye(2, dtype=np.float32)[::-1])
+
+    assert NumpyCollection(path).count() == 0
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+from src.rate_limiter import LimiterTimeout, LLMRateLimiter
+
+
+@pytest.mark.asyncio
+async def test_callers_queue_for_a_slot_until_their_deadline():
+    limiter = LLMRateLimiter(initial_concurrency=1, max_concurrency=1)
+    order = []
+
+    async def call(name, hold, deadline_in):
+        async with limiter.slot(10, time.monotonic() + deadline_in):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    first = asyncio.create_task(call("first", 0.05, 1))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(call("queued", 0, 1))
+    with pytest.raises(LimiterTimeout):
+        await call("impatient", 0, 0.01)
+    await asyncio.gather(first, queued)
+
+    assert order == ["first", "queued"]
+    assert limiter.stats()["timed_out"] == 1
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_aimd_backs_off_on_429_and_latency_and_recovers():
+    limiter = LLMRateLimiter(initial_concurrency=8, latency_target=0.01)
+
+    async with limiter.slot(10, time.monotonic() + 1) as permit:
+        permit.overloaded = True
+    assert limiter.stats()["concurrency_limit"] == 4
+
+    async with limiter.slot(10, time.monotonic() + 1):
+        await asyncio.sleep(0.02)
+    assert limiter.stats()["concurrency_limit"] == 2
+
+    limiter.latency_target = 10
+    for _ in range(6):
+        async with limiter.slot(10, time.monotonic() + 1):
+            pass
+    assert limiter.stats()["concurrency_limit"] == 4
+    assert limiter.stats()["throttled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute_budget_delays_calls():
+    limiter = LLMRateLimiter(requests_per_minute=600)  # one call per 100ms once drained
+    limiter.requests.tokens = 0
+
+    started = time.monotonic()
+    async with limiter.slot(10, time.monotonic() + 1):
+        pass
+
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from src.retry import RetryPolicy, retry_after_seconds
+
+
+def rate_limit_error(headers=None) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://test/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_retry_after_headers_are_parsed():
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(rate_limit_error({"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(rate_limit_error()) is None
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_until_success():
+    policy = RetryPolicy(max_attempts=3)
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise rate_limit_error({"retry-after-ms": "10"})
+        return "ok"
+
+    assert await policy.run(attempt, deadline=time.monotonic() + 5) == "ok"
+    assert calls == 3
+    assert policy.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_past_the_deadline_or_permanent_errors():
+    policy = RetryPolicy(max_attempts=5)
+
+    async def throttled():
+        raise rate_limit_error({"retry-after": "30"})
+
+    with pytest.raises(openai.RateLimitError):
+        await policy.run(throttled, deadline=time.monotonic() + 1)
+
+    async def broken():
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        await policy.run(broken, deadline=time.monotonic() + 5)
+    assert policy.stats()["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedges_attempts_slower_than_p95():
+    policy = RetryPolicy(hedge=True, hedge_min_delay=0.01)
+    for _ in range(20):
+        policy.latency.record(0.01)
+    delays = [1.0, 0.0]
+
+    async def attempt():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await policy.run(attempt, deadline=time.monotonic() + 5) == 0.0
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
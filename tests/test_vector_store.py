@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import numpy as np
+
+from src.embeddings import CachedEmbeddingFunction
+from tests.conftest import LetterCountEmbedding
+from src.timing import start_timings
+from src.vector_store import VectorStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    vs = VectorStore(
+        persist_directory=str(tmp_path / "chroma_db"),
+        max_workers=1,
+        embedding_function=CachedEmbeddingFunction(LetterCountEmbedding()),
+    )
+    yield vs
+    vs.close()
+
+
+@pytest.mark.asyncio
+async def test_asearch_runs_off_event_loop(store, monkeypatch):
+    def slow_search(query, top_k=5):
+        time.sleep(0.05)
+        return [{"attribute_name": query, "prompt": "", "system_role": ""}], [0.0]
+
+    monkeypatch.setattr(store, "search", slow_search)
+
+    results = await asyncio.gather(*(store.asearch(f"attr_{i}") for i in range(3)))
+
+    assert [docs[0]["attribute_name"] for docs, _ in results] == [
+        "attr_0",
+        "attr_1",
+        "attr_2",
+    ]
+    stats = store.executor_stats()
+    assert stats["max_workers"] == 1
+    assert stats["completed"] == 3
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["peak_queue_depth"] >= 2
+
+
+def test_exact_index_is_loaded_from_existing_collection(tmp_path):
+    path = str(tmp_path / "chroma_db")
+    first = VectorStore(persist_directory=path)
+    first.collection.upsert(
+        ids=["attr_screen_resolution"],
+        documents=["Screen Resolution"],
+        embeddings=[[0.1, 0.2, 0.3]],
+        metadatas=[{"prompt": "What is the resolution?", "system_role": "expert"}],
+    )
+    first.close()
+
+    reopened = VectorStore(persist_directory=path)
+    match = reopened.get_exact("  screen   RESOLUTION ")
+    reopened.close()
+
+    assert match["attribute_name"] == "Screen Resolution"
+    assert match["prompt"] == "What is the resolution?"
+    assert reopened.get_exact("Resolution") is None
+
+
+def test_search_many_uses_query_embedding_cache(store):
+    store.add_texts(
+        ids=["attr_color", "attr_material"],
+        texts=["Color", "Material"],
+        metadatas=[{"prompt": "p1", "system_role": "r"}, {"prompt": "p2"}],
+    )
+    model = store.embedding_function.embedding_function
+    embedded_on_ingest = model.texts
+
+    results = store.search_many(["colour", "Colour ", "materials"], top_k=1)
+
+    assert [docs[0]["attribute_name"] for docs, _ in results] == [
+        "Color",
+        "Color",
+        "Material",
+    ]
+    assert model.texts - embedded_on_ingest == 2  # "colour" embedded once
+
+    store.search("COLOUR", top_k=1)
+    assert model.texts - embedded_on_ingest == 2
+    assert store.embedding_stats()["hits"] == 2
+
+
+def test_add_texts_embeds_the_first_chunk_before_starting_workers(store):
+    model = store.embedding_function.embedding_function
+    threads = []
+    embed = model.__call__
+
+    def recording_embed(input):
+        threads.append(threading.current_thread().name)
+        return embed(input)
+
+    store.embedding_function.embedding_function = recording_embed
+    texts = [f"Attribute {i}" for i in range(6)]
+    store.add_texts(
+        ids=[f"attr_{i}" for i in range(6)],
+        texts=texts,
+        metadatas=[{"prompt": "p"}] * 6,
+        batch_size=2,
+        workers=2,
+    )
+
+    assert threads[0] == threading.current_thread().name
+    assert all(name.startswith("vector-index") for name in threads[1:])
+    assert store.count() == 6
+
+
+def test_search_many_dedupes_and_chunks_queries(store, monkeypatch):
+    store.add_texts(
+        ids=["attr_color", "attr_size"],
+        texts=["Color", "Size"],
+        metadatas=[{"prompt": "p1"}, {"prompt": "p2"}],
+    )
+    query_sizes = []
+    query = store.collection.query
+
+    def counting_query(query_embeddings, n_results):
+        query_sizes.append(len(query_embeddings))
+        return query(query_embeddings=query_embeddings, n_results=n_results)
+
+    monkeypatch.setattr(store.collection, "query", counting_query)
+
+    queries = ["color", "size", "color", "colors", "sizes"]
+    results = store.search_many(queries, top_k=1, batch_size=2)
+
+    assert query_sizes == [2, 2]  # four distinct queries in chunks of two
+    assert [docs[0]["attribute_name"] for docs, _ in results] == [
+        "Color",
+        "Size",
+        "Color",
+        "Color",
+        "Size",
+    ]
+    assert results[0] == results[2]
+
+
+@pytest.mark.asyncio
+async def test_asearch_records_stage_timings_for_the_caller(store):
+    store.add_texts(ids=["attr_color"], texts=["Color"], metadatas=[{"prompt": "p"}])
+
+    timings = start_timings()
+    await store.asearch("colour", top_k=1)
+
+    assert {"search_queue", "embed", "search", "parse"} <= set(timings)
+
+
+def test_count_is_cached_and_refreshed_on_writes(store):
+    assert store.count() == 0
+    assert store.model_loaded is False
+
+    store.add_texts(
+        ids=["attr_a", "attr_b"],
+        texts=["A", "B"],
+        metadatas=[{"prompt": "a"}, {"prompt": "b"}],
+    )
+    assert store.count() == 2
+    assert store.model_loaded is True
+
+    store.delete(["attr_a"])
+    assert store.count() == 1
+
+    # Writes that bypass the store are picked up by the periodic refresh.
+    store.collection.delete(ids=["attr_b"])
+    assert store.count() == 1
+    assert store.refresh_count() == 0
+    assert store.count() == 0
+
+
+def test_embedding_cache_persists_across_restarts(tmp_path):
+    path = str(tmp_path / "embedding_cache.npy")
+    model = LetterCountEmbedding()
+    cache = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+    first = cache.embed_query(["Color", "Size", "Weight"])
+    cache.close()
+
+    reopened = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+    again = reopened.embed_query(["weight", "size"])
+
+    assert model.texts == 3
+    np.testing.assert_allclose(again[0], first[2])
+    assert reopened.stats()["entries"] == 2
+
+
+def test_embedding_cache_unclean_exit_keeps_vectors_and_keys_consistent(tmp_path):
+    path = str(tmp_path / "embedding_cache.npy")
+    model = LetterCountEmbedding()
+    cache = CachedEmbeddingFunction(model, max_entries=1, persist_path=path)
+    expected = cache.embed_query(["aaaa"])[0]
+    cache.close()
+
+    # Evicts "aaaa" and reuses its row, then exits without flushing.
+    crashed = CachedEmbeddingFunction(model, max_entries=1, persist_path=path)
+    crashed.embed_query(["zzzz"])
+    del crashed
+
+    reopened = CachedEmbeddingFunction(model, max_entries=1, persist_path=path)
+    np.testing.assert_allclose(reopened.embed_query(["aaaa"])[0], expected)
+    assert reopened.stats()["hits"] == 1
+
+
+def test_embedding_cache_with_mismatched_files_starts_empty(tmp_path):
+    path = str(tmp_path / "embedding_cache.npy")
+    model = LetterCountEmbedding()
+    cache = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+    cache.embed_query(["Color"])
+    cache.close()
+    # Vectors replaced by another writer without the matching key file.
+    np.save(path, np.ones((2, 26), dtype=np.float32))
+
+    reopened = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+
+    assert reopened.stats()["entries"] == 0
+
+
+def test_embedding_cache_is_dropped_when_the_backend_changes(tmp_path):
+    path = str(tmp_path / "embedding_cache.npy")
+    model = LetterCountEmbedding()
+    model.signature = "letters:fp32"
+    cache = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+    cache.embed_query(["Color"])
+    cache.close()
+
+    model.signature = "letters:int8"
+    reopened = CachedEmbeddingFunction(model, max_entries=2, persist_path=path)
+
+    assert reopened.stats()["entries"] == 0